@@ -8,10 +8,11 @@ import json
 import csv
 import time
 import threading
-import random
+from collections import namedtuple
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox
+import numpy as np
 
 # Configuration
 ESP32_IP = "NeuroCursor-esp.local"  # ⚠️ CHANGE THIS
@@ -24,22 +25,37 @@ SAMPLES_PER_DIRECTION = 60 # Increased samples for better distinct values
 DISPLAY_TIME = 5  # Increased seconds to show each arrow (more precise collection)
 REST_TIME = 2     # Increased seconds rest between trials
 
-# Current EEG data (latest)
-current_data = {
-    "sig": 200, "att": 0, "med": 0, "raw": 0,
-    "delta": 0, "theta": 0, "la": 0, "ha": 0,
-    "lb": 0, "hb": 0, "lg": 0, "mg": 0
-}
-data_lock = threading.Lock()
+# Current EEG data (latest), published as an immutable snapshot.
+# The WebSocket thread swaps _snapshot[0] in one assignment (atomic under the GIL),
+# so readers just take _snapshot[0] without locking.
+EEGSample = namedtuple("EEGSample", [
+    "sig", "att", "med", "raw",
+    "delta", "theta", "la", "ha",
+    "lb", "hb", "lg", "mg"
+])
+_snapshot = [EEGSample(200, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)]
+data_version = 0  # Bumped after every published snapshot
 ws_connected = False
 
-# Training session data
-training_data = []
+# Training session data: preallocated structured array, one row per sample
+CSV_FIELDS = (
+    "timestamp", "direction", "signal_quality", "attention", "meditation", "raw",
+    "delta", "theta", "low_alpha", "high_alpha",
+    "low_beta", "high_beta", "low_gamma", "mid_gamma"
+)
+SAMPLE_DTYPE = np.dtype(
+    [("timestamp", "f8"), ("direction", "U6")] + [(name, "i4") for name in CSV_FIELDS[2:]]
+)
 current_trial = 0
 total_trials = 100 * len(DIRECTIONS) # Default for UI initialization
+training_data = np.empty(total_trials, dtype=SAMPLE_DTYPE)
+sample_count = 0  # Rows of training_data in use
+sample_lock = threading.Lock()  # Training thread and manual clicks both add samples
 is_training = False
 is_paused = False
 current_direction = None
+# Notified whenever is_training / is_paused change so training waits wake immediately
+state_cond = threading.Condition()
 
 # CSV file
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -89,19 +105,23 @@ class TrainingApp:
         tk.Label(values_frame, text="Current Values:", font=("Arial", 12, "bold"), 
                 bg="white").grid(row=0, column=0, columnspan=4, pady=5)
         
-        self.att_label = tk.Label(values_frame, text="Attention: --", 
+        self.att_var = tk.StringVar(value="Attention: --")
+        self.att_label = tk.Label(values_frame, textvariable=self.att_var, 
                                  font=("Arial", 11), bg="white")
         self.att_label.grid(row=1, column=0, padx=15, pady=5)
         
-        self.med_label = tk.Label(values_frame, text="Meditation: --", 
+        self.med_var = tk.StringVar(value="Meditation: --")
+        self.med_label = tk.Label(values_frame, textvariable=self.med_var, 
                                  font=("Arial", 11), bg="white")
         self.med_label.grid(row=1, column=1, padx=15, pady=5)
         
-        self.alpha_label = tk.Label(values_frame, text="Alpha: --", 
+        self.alpha_var = tk.StringVar(value="Alpha: --")
+        self.alpha_label = tk.Label(values_frame, textvariable=self.alpha_var, 
                                    font=("Arial", 11), bg="white")
         self.alpha_label.grid(row=1, column=2, padx=15, pady=5)
         
-        self.beta_label = tk.Label(values_frame, text="Beta: --", 
+        self.beta_var = tk.StringVar(value="Beta: --")
+        self.beta_label = tk.Label(values_frame, textvariable=self.beta_var, 
                                   font=("Arial", 11), bg="white")
         self.beta_label.grid(row=1, column=3, padx=15, pady=5)
         
@@ -119,8 +139,9 @@ class TrainingApp:
         progress_frame = tk.Frame(main_frame, bg="#f0f0f0")
         progress_frame.pack(pady=10, fill="x")
         
+        self.progress_var = tk.StringVar(value=f"Progress: 0/{total_trials}")
         self.progress_label = tk.Label(progress_frame, 
-                                       text=f"Progress: 0/{total_trials}", 
+                                       textvariable=self.progress_var, 
                                        font=("Arial", 12), bg="#f0f0f0")
         self.progress_label.pack()
         
@@ -182,48 +203,54 @@ class TrainingApp:
         self.click_button.pack(pady=5)
         
         # Start WebSocket and update loop
+        self._last_seen = None
         self.update_ui()
         
     def update_ui(self):
         """Update UI with current data"""
-        global ws_connected, current_data
-        
-        with data_lock:
-            # Connection status
-            if ws_connected:
-                self.status_label.config(text="🟢 Connected", fg="#27ae60")
-            else:
-                self.status_label.config(text="🔴 Disconnected", fg="#e74c3c")
-            
-            # Signal quality (0=good, 200=bad, invert for display)
-            sig = current_data["sig"]
-            quality_percent = max(0, 100 - (sig / 2))
-            self.signal_bar['value'] = quality_percent
-            
-            if sig == 0:
-                self.signal_text.config(text="Excellent", fg="#27ae60")
-            elif sig < 50:
-                self.signal_text.config(text="Good", fg="#f39c12")
-            elif sig < 100:
-                self.signal_text.config(text="Fair", fg="#e67e22")
-            else:
-                self.signal_text.config(text="Poor", fg="#e74c3c")
-            
-            # Current values
-            self.att_label.config(text=f"Attention: {current_data['att']}")
-            self.med_label.config(text=f"Meditation: {current_data['med']}")
-            
-            alpha_sum = current_data['la'] + current_data['ha']
-            beta_sum = current_data['lb'] + current_data['hb']
-            self.alpha_label.config(text=f"Alpha: {alpha_sum}")
-            self.beta_label.config(text=f"Beta: {beta_sum}")
+        # Skip the widget updates entirely when nothing changed since last tick
+        state = (data_version, ws_connected)
+        if state == self._last_seen:
+            self.root.after(100, self.update_ui)
+            return
+        self._last_seen = state
+        snap = _snapshot[0]
+        
+        # Connection status
+        if ws_connected:
+            self.status_label.config(text="🟢 Connected", fg="#27ae60")
+        else:
+            self.status_label.config(text="🔴 Disconnected", fg="#e74c3c")
+        
+        # Signal quality (0=good, 200=bad, invert for display)
+        sig = snap.sig
+        quality_percent = max(0, 100 - (sig / 2))
+        self.signal_bar['value'] = quality_percent
+        
+        if sig == 0:
+            self.signal_text.config(text="Excellent", fg="#27ae60")
+        elif sig < 50:
+            self.signal_text.config(text="Good", fg="#f39c12")
+        elif sig < 100:
+            self.signal_text.config(text="Fair", fg="#e67e22")
+        else:
+            self.signal_text.config(text="Poor", fg="#e74c3c")
+        
+        # Current values
+        self.att_var.set(f"Attention: {snap.att}")
+        self.med_var.set(f"Meditation: {snap.med}")
+        
+        alpha_sum = snap.la + snap.ha
+        beta_sum = snap.lb + snap.hb
+        self.alpha_var.set(f"Alpha: {alpha_sum}")
+        self.beta_var.set(f"Beta: {beta_sum}")
         
         # Schedule next update
         self.root.after(100, self.update_ui)
     
     def start_training(self):
         """Start training session"""
-        global is_training, current_trial, training_data, total_trials, DISPLAY_TIME
+        global is_training, current_trial, training_data, sample_count, total_trials, DISPLAY_TIME
         
         if not ws_connected:
             messagebox.showerror("Error", "Please wait for WebSocket connection!")
@@ -234,7 +261,7 @@ class TrainingApp:
         samples_per_dir = self.samples_var.get()
         total_trials = samples_per_dir * len(DIRECTIONS)
         
-        if current_data["sig"] > 100:
+        if _snapshot[0].sig > 100:
             response = messagebox.askwarning("Warning", 
                 "Signal quality is poor. Continue anyway?")
             if not response:
@@ -242,7 +269,8 @@ class TrainingApp:
         
         is_training = True
         current_trial = 0
-        training_data = []
+        training_data = np.empty(total_trials, dtype=SAMPLE_DTYPE)
+        sample_count = 0
         
         self.start_button.config(state="disabled")
         self.pause_button.config(state="normal")
@@ -254,21 +282,25 @@ class TrainingApp:
     def stop_training(self):
         """Stop training session"""
         global is_training, is_paused
-        is_training = False
-        is_paused = False
+        with state_cond:
+            is_training = False
+            is_paused = False
+            state_cond.notify_all()
         
         self.start_button.config(state="normal")
         self.pause_button.config(state="disabled", text="⏸ PAUSE", bg="#f39c12")
         self.stop_button.config(state="disabled")
         self.arrow_label.config(text="Session Ended", fg="#95a5a6", font=("Segoe UI", 40, "bold"))
         
-        if len(training_data) > 0:
+        if sample_count > 0:
             self.save_data()
 
     def toggle_pause(self):
         """Toggle pause state"""
         global is_paused
-        is_paused = not is_paused
+        with state_cond:
+            is_paused = not is_paused
+            state_cond.notify_all()
         
         if is_paused:
             self.pause_button.config(text="▶ RESUME", bg="#2980b9")
@@ -288,26 +320,33 @@ class TrainingApp:
         self.click_button.config(bg="#d35400")
         self.root.after(200, lambda: self.click_button.config(bg=original_bg))
     
+    def wait_active(self, duration):
+        """Block for `duration` seconds of unpaused time; False if training stopped"""
+        remaining = duration
+        with state_cond:
+            while is_training:
+                if is_paused:
+                    state_cond.wait()
+                    continue
+                if remaining <= 0:
+                    return True
+                start = time.monotonic()
+                state_cond.wait(remaining)
+                remaining -= time.monotonic() - start
+        return False
+    
     def training_loop(self, samples_per_dir):
         """Main training loop"""
-        global current_trial, current_direction, training_data
+        global current_trial, current_direction
         
-        # Create randomized sequence
-        sequence = []
-        for direction in DIRECTIONS:
-            sequence.extend([direction] * samples_per_dir)
-        random.shuffle(sequence)
+        # Create randomized sequence of direction indices
+        sequence = np.repeat(np.arange(len(DIRECTIONS), dtype=np.int8), samples_per_dir)
+        np.random.shuffle(sequence)
         
-        for i, direction in enumerate(sequence):
-            # Check for stop
-            if not is_training:
-                break
-            
-            # Check for pause
-            while is_paused and is_training:
-                time.sleep(0.5)
-            
-            if not is_training:
+        for i, dir_idx in enumerate(sequence):
+            direction = DIRECTIONS[dir_idx]
+            # Wait out any pause; stop if the session ended
+            if not self.wait_active(0):
                 break
 
             current_trial = i + 1
@@ -316,29 +355,13 @@ class TrainingApp:
             # Update UI
             self.root.after(0, self.update_training_ui, direction)
             
-            # Wait and collect (check pause during wait)
-            start_time = time.time()
-            while time.time() - start_time < DISPLAY_TIME:
-                if not is_training: break
-                while is_paused and is_training:
-                    time.sleep(0.5)
-                    start_time += 0.5 # Offset start time to compensate for pause
-                time.sleep(0.1)
-
-            # Collect data sample
-            if is_training:
+            # Wait (paused time does not count), then collect data sample
+            if self.wait_active(DISPLAY_TIME):
                 self.collect_sample(direction)
             
             # Rest period
             self.root.after(0, lambda: self.arrow_label.config(text="Rest", fg="#7f8c8d"))
-            
-            rest_start = time.time()
-            while time.time() - rest_start < REST_TIME:
-                if not is_training: break
-                while is_paused and is_training:
-                    time.sleep(0.5)
-                    rest_start += 0.5
-                time.sleep(0.1)
+            self.wait_active(REST_TIME)
         
         # Training complete
         if is_training:
@@ -366,31 +389,23 @@ class TrainingApp:
         
         self.arrow_label.config(text=arrow_symbols[direction], 
                                fg=colors[direction])
-        self.progress_label.config(text=f"Progress: {current_trial}/{total_trials} - Focusing: {direction}")
+        self.progress_var.set(f"Progress: {current_trial}/{total_trials} - Focusing: {direction}")
         self.progress_bar['value'] = (current_trial / total_trials) * 100
     
     def collect_sample(self, direction):
         """Collect one training sample"""
-        global training_data
-        
-        with data_lock:
-            sample = {
-                "timestamp": time.time(),
-                "direction": direction,
-                "signal_quality": current_data["sig"],
-                "attention": current_data["att"],
-                "meditation": current_data["med"],
-                "raw": current_data["raw"],
-                "delta": current_data["delta"],
-                "theta": current_data["theta"],
-                "low_alpha": current_data["la"],
-                "high_alpha": current_data["ha"],
-                "low_beta": current_data["lb"],
-                "high_beta": current_data["hb"],
-                "low_gamma": current_data["lg"],
-                "mid_gamma": current_data["mg"],
-            }
-            training_data.append(sample)
+        global training_data, sample_count
+        
+        with sample_lock:
+            if sample_count == len(training_data):
+                # Manual clicks can exceed the planned trial count
+                grown = np.empty(max(2 * len(training_data), 64), dtype=SAMPLE_DTYPE)
+                grown[:sample_count] = training_data[:sample_count]
+                training_data = grown
+            
+            # EEGSample fields are already in CSV column order
+            training_data[sample_count] = (time.time(), direction) + _snapshot[0]
+            sample_count += 1
     
     def training_complete(self):
         """Handle training completion"""
@@ -405,21 +420,20 @@ class TrainingApp:
         
         self.save_data()
         messagebox.showinfo("Complete", 
-                          f"Training complete! {len(training_data)} samples collected.\n"
+                          f"Training complete! {sample_count} samples collected.\n"
                           f"Data saved to: {csv_filename}")
     
     def save_data(self):
         """Save training data to CSV"""
-        if len(training_data) == 0:
+        if sample_count == 0:
             return
         
         with open(csv_filename, 'w', newline='') as f:
-            fieldnames = training_data[0].keys()
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(training_data)
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            writer.writerows(training_data[:sample_count].tolist())
         
-        print(f"✅ Saved {len(training_data)} samples to {csv_filename}")
+        print(f"✅ Saved {sample_count} samples to {csv_filename}")
 
 # WebSocket handlers
 def on_open(ws):
@@ -435,15 +449,21 @@ def on_close(ws, close_status_code, close_msg):
 def on_error(ws, error):
     print(f"⚠️ WebSocket error: {error}")
 
-def on_message(ws, message):
-    global current_data
+def on_message(ws, message, _loads=json.loads, _snapshot=_snapshot,
+               _make=EEGSample._make, _fields=EEGSample._fields):
+    # Module objects are bound as default arguments so lookups are fast locals
+    global data_version
     
     try:
-        data = json.loads(message)
-        with data_lock:
-            current_data.update(data)
-    except:
-        pass
+        data = _loads(message)
+        # Keys missing from a packet keep their previous value
+        prev = _snapshot[0]
+        _snapshot[0] = _make(
+            data.get(key, old) for key, old in zip(_fields, prev)
+        )
+        data_version += 1
+    except (ValueError, TypeError, AttributeError):
+        pass  # Malformed frame, keep the previous snapshot
 
 def run_websocket():
     """Run WebSocket in background"""
@@ -457,7 +477,7 @@ def run_websocket():
                 on_close=on_close
             )
             ws.run_forever()
-        except:
+        except (websocket.WebSocketException, OSError):
             pass
         time.sleep(3)
 
@@ -6,20 +6,32 @@ Receives brainwave data from ESP32-S3 and displays live graphs
 import websocket
 import json
 import csv
+import os
+import struct
 import time
 import threading
+import queue
 from datetime import datetime
-from collections import deque
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 from matplotlib.gridspec import GridSpec
 import numpy as np
 
+# Optional faster JSON decoder for the per-packet hot path
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 # Configuration
 ESP32_IP = "NeuroCursor-esp.local"  # ⚠️ CHANGE THIS TO YOUR ESP32 IP
 WS_PORT = 81
 WS_URL = f"ws://{ESP32_IP}:{WS_PORT}"
 
+# Binary frame sent when the firmware is built with BINARY_FRAMES=1:
+# sig, att, med, raw as int16 followed by the 8 band powers as uint32 (little-endian)
+BINARY_FRAME = struct.Struct("<4h8I")
+
 # Band configuration
 BANDS = [
     {"key": "delta", "label": "Delta", "color": "#8e44ad"},
@@ -31,24 +43,33 @@ BANDS = [
     {"key": "lg", "label": "L-Gamma", "color": "#c0392b"},
     {"key": "mg", "label": "M-Gamma", "color": "#e67e22"}
 ]
+BAND_KEYS = tuple(b["key"] for b in BANDS)
 
 # Data storage - REDUCED MAX POINTS for performance
 MAX_POINTS = 100  # Reduced from 200
-band_data = {b["key"]: deque(maxlen=MAX_POINTS) for b in BANDS}
-attention_data = deque(maxlen=MAX_POINTS)
-meditation_data = deque(maxlen=MAX_POINTS)
-signal_quality = deque(maxlen=MAX_POINTS)
+RESCALE_INTERVAL_MS = 5000  # Band y-limits are refit on this timer, never per frame
+RENDER_INTERVAL_MS = 33     # Redraw check (~30 FPS); only renders when new data arrived
+STATUS_INTERVAL_MS = 1000
+# Ring buffers are mirrored: each sample is stored at i and i + MAX_POINTS, so the
+# latest window is always the contiguous view buf[start:start + filled]
+band_buf = np.zeros((len(BANDS), 2 * MAX_POINTS), dtype=np.float32)
+attention_buf = np.zeros(2 * MAX_POINTS, dtype=np.float32)
+meditation_buf = np.zeros(2 * MAX_POINTS, dtype=np.float32)
+signal_buf = np.zeros(2 * MAX_POINTS, dtype=np.float32)
+write_idx = 0  # Next slot to write
+filled = 0     # Number of valid samples (<= MAX_POINTS)
 
 # Statistics
 packet_count = 0
 start_time = time.time()
 connection_status = "Disconnected"
 last_update = time.time()
+need_redraw = False  # Set when new data arrives; cleared by render_frame
 
 # CSV file setup
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 csv_filename = f"eeg_data_{timestamp}.csv"
-csvfile = open(csv_filename, "w", newline="", buffering=8192)  # Buffer writes
+csvfile = open(csv_filename, "w", newline="", buffering=1024 * 1024)  # 1 MiB buffer: typical sessions never flush mid-run
 csv_writer = csv.writer(csvfile)
 csv_writer.writerow([
     "timestamp", "signal_quality", "attention", "meditation", "raw",
@@ -56,8 +77,17 @@ csv_writer.writerow([
     "low_beta", "high_beta", "low_gamma", "mid_gamma"
 ])
 
+# Pending CSV rows, written out in one writerows() call per batch
+CSV_BATCH_SIZE = 50
+_csv_batch = []
+
 print(f"📝 CSV file created: {csv_filename}")
 
+# Cheaper rasterization for the live plots
+plt.rcParams['path.simplify'] = True
+plt.rcParams['path.simplify_threshold'] = 1.0
+plt.rcParams['agg.path.chunksize'] = 1000
+
 # Create simplified figure
 fig = plt.figure(figsize=(14, 8))
 fig.suptitle('🧠 EEG Real-time Monitor', fontsize=14, fontweight='bold')
@@ -79,7 +109,7 @@ for i, band in enumerate(BANDS):
 lines = {}
 for band in BANDS:
     ax = axes[band["key"]]
-    line, = ax.plot([], [], color=band["color"], linewidth=1.5, antialiased=True)
+    line, = ax.plot([], [], color=band["color"], linewidth=1.5, antialiased=False, animated=True)
     ax.set_title(band["label"], fontsize=9)
     ax.set_xlim(0, MAX_POINTS)
     ax.set_ylim(0, 100000)  # Fixed scale initially
@@ -88,7 +118,7 @@ for band in BANDS:
     lines[band["key"]] = line
 
 # Attention line
-line_attention, = ax_attention.plot([], [], color='#e74c3c', linewidth=1.5)
+line_attention, = ax_attention.plot([], [], color='#e74c3c', linewidth=1.5, antialiased=False, animated=True)
 ax_attention.set_title('Attention', fontsize=9)
 ax_attention.set_ylim(0, 100)
 ax_attention.set_xlim(0, MAX_POINTS)
@@ -96,7 +126,7 @@ ax_attention.grid(True, alpha=0.2, linewidth=0.5)
 ax_attention.tick_params(labelsize=7)
 
 # Meditation line
-line_meditation, = ax_meditation.plot([], [], color='#3498db', linewidth=1.5)
+line_meditation, = ax_meditation.plot([], [], color='#3498db', linewidth=1.5, antialiased=False, animated=True)
 ax_meditation.set_title('Meditation', fontsize=9)
 ax_meditation.set_ylim(0, 100)
 ax_meditation.set_xlim(0, MAX_POINTS)
@@ -104,15 +134,24 @@ ax_meditation.grid(True, alpha=0.2, linewidth=0.5)
 ax_meditation.tick_params(labelsize=7)
 
 # Signal Quality line
-line_signal, = ax_signal.plot([], [], color='#2ecc71', linewidth=1.5)
+line_signal, = ax_signal.plot([], [], color='#2ecc71', linewidth=1.5, antialiased=False, animated=True)
 ax_signal.set_title('Signal Quality', fontsize=9)
 ax_signal.set_ylim(0, 200)
 ax_signal.set_xlim(0, MAX_POINTS)
 ax_signal.grid(True, alpha=0.2, linewidth=0.5)
 ax_signal.tick_params(labelsize=7)
 
+# Band lines/axes in BANDS order, so band_buf row i maps to band_lines[i]
+band_lines = [lines[b["key"]] for b in BANDS]
+band_axes = [axes[b["key"]] for b in BANDS]
+
+# Every plotted line; all share the same x data
+all_lines = [line_attention, line_meditation, line_signal] + band_lines
+line_x_len = 0  # Length of the x data currently set on all_lines
+
 # Status text
-status_text = fig.text(0.7, 0.97, '', fontsize=8, verticalalignment='top')
+status_text = fig.text(0.7, 0.97, '', fontsize=8, verticalalignment='top', animated=True)
+blit_bg = None  # Figure background without the animated artists
 
 def update_status_text():
     """Update status information"""
@@ -124,6 +163,12 @@ def update_status_text():
     status = f"{connection_status} | Pkts: {packet_count} | {rate:.1f}/s | {elapsed:.0f}s"
     status_text.set_text(status)
 
+def on_status_timer():
+    """Refresh the status text once per STATUS_INTERVAL_MS"""
+    global need_redraw
+    update_status_text()
+    need_redraw = True
+
 def on_open(ws):
     """WebSocket connection opened"""
     global connection_status
@@ -140,96 +185,157 @@ def on_error(ws, error):
     """WebSocket error occurred"""
     print(f"⚠️ Error: {error}")
 
-def on_message(ws, message):
-    """Process incoming WebSocket message"""
-    global packet_count, last_update
+# Raw WebSocket messages, parsed in batches on the consumer thread
+MSG_BATCH_SIZE = 16
+msg_q = queue.SimpleQueue()
+
+# Hot-path callbacks bind module objects as default arguments (fast locals
+# instead of global lookups); counters below still need `global`.
+def on_message(ws, message, _put=msg_q.put):
+    """Queue incoming WebSocket message; parsing happens in consume_messages"""
+    _put(message)
+
+def process_message(message, _loads=json_loads, _unpack=BINARY_FRAME.unpack,
+                    _now=time.time, _band_keys=BAND_KEYS):
+    """Decode one message into the ring buffers and CSV batch"""
+    global packet_count, last_update, write_idx, filled
     
     try:
-        data = json.loads(message)
-        current_time = time.time()
-        packet_count += 1
-        
         # Extract values
-        sig = data.get("sig", 200)
-        att = data.get("att", 0)
-        med = data.get("med", 0)
-        raw = data.get("raw", 0)
+        if isinstance(message, bytes):
+            sig, att, med, raw, *band_values = _unpack(message)
+        else:
+            data = _loads(message)
+            sig = data.get("sig", 200)
+            att = data.get("att", 0)
+            med = data.get("med", 0)
+            raw = data.get("raw", 0)
+            band_values = [data.get(key, 0) for key in _band_keys]
+        
+        current_time = _now()
+        packet_count += 1
         
         # Update data
-        attention_data.append(att)
-        meditation_data.append(med)
-        signal_quality.append(sig)
+        i = write_idx
+        j = i + MAX_POINTS
+        attention_buf[i] = attention_buf[j] = att
+        meditation_buf[i] = meditation_buf[j] = med
+        signal_buf[i] = signal_buf[j] = sig
         
         # Update band data
-        band_values = []
-        for band in BANDS:
-            value = data.get(band["key"], 0)
-            band_data[band["key"]].append(value)
-            band_values.append(value)
+        band_buf[:, i] = band_buf[:, j] = band_values
+        
+        write_idx = (i + 1) % MAX_POINTS
+        if filled < MAX_POINTS:
+            filled += 1
         
-        # Write to CSV every 5 packets to reduce I/O
+        # Log every 5th packet, flushing to CSV in batches to reduce I/O
         if packet_count % 5 == 0:
-            csv_writer.writerow([
+            _csv_batch.append((
                 current_time, sig, att, med, raw,
                 band_values[0], band_values[1], band_values[2], band_values[3],
                 band_values[4], band_values[5], band_values[6], band_values[7]
-            ])
+            ))
+            if len(_csv_batch) >= CSV_BATCH_SIZE:
+                csv_writer.writerows(_csv_batch)
+                _csv_batch.clear()
         
         last_update = current_time
         
-    except Exception as e:
-        if packet_count % 100 == 0:  # Only print errors occasionally
+    except (ValueError, TypeError, AttributeError, struct.error) as e:
+        # Malformed frame; only print errors occasionally
+        if packet_count % 100 == 0:
             print(f"⚠️ Error: {e}")
 
-# Pre-allocate x-axis data
-x_data = np.arange(MAX_POINTS)
+def consume_messages():
+    """Drain queued messages in batches of up to MSG_BATCH_SIZE"""
+    global need_redraw
+    while True:
+        batch = [msg_q.get()]
+        while len(batch) < MSG_BATCH_SIZE and not msg_q.empty():
+            batch.append(msg_q.get_nowait())
+        for message in batch:
+            process_message(message)
+        need_redraw = True
+
+def window_bounds():
+    """Return (start, end) of the latest window in the mirrored ring buffers"""
+    n = filled
+    # Oldest sample sits at write_idx once the ring has wrapped
+    start = write_idx if n == MAX_POINTS else 0
+    return start, start + n
 
-def animate(frame):
-    """Animation function - OPTIMIZED"""
+def rescale_band_axes():
+    """Refit band y-limits to the visible data (runs outside the blit path)"""
+    start, end = window_bounds()
+    if end - start <= 10:
+        return
     
-    # Only update if we have recent data (within last 2 seconds)
-    if time.time() - last_update > 2:
-        return []
+    rescaled = False
+    for ax, max_val in zip(band_axes, band_buf[:, start:end].max(axis=1)):
+        if max_val <= 0:
+            continue
+        top = ax.get_ylim()[1]
+        # Only redraw when the data outgrows the axis or shrinks well below it
+        if max_val > top or max_val * 2 < top:
+            ax.set_ylim(0, max_val * 1.2)
+            rescaled = True
     
-    updated_lines = []
+    if rescaled:
+        fig.canvas.draw_idle()
+
+# Pre-allocate x-axis data
+x_data = np.arange(MAX_POINTS)
+
+def update_lines():
+    """Push the latest ring-buffer window into the plot lines"""
+    global line_x_len
     
-    # Update attention
-    if len(attention_data) > 0:
-        x = np.arange(len(attention_data))
-        line_attention.set_data(x, list(attention_data))
-        updated_lines.append(line_attention)
+    start, end = window_bounds()
+    n = end - start
+    if n == 0:
+        return
     
-    # Update meditation
-    if len(meditation_data) > 0:
-        x = np.arange(len(meditation_data))
-        line_meditation.set_data(x, list(meditation_data))
-        updated_lines.append(line_meditation)
+    # x only changes while the window fills up; afterwards only y is replaced
+    if n != line_x_len:
+        x = x_data[:n]  # View, no per-frame allocation
+        for line in all_lines:
+            line.set_xdata(x)
+        line_x_len = n
     
-    # Update signal quality
-    if len(signal_quality) > 0:
-        x = np.arange(len(signal_quality))
-        line_signal.set_data(x, list(signal_quality))
-        updated_lines.append(line_signal)
+    # Update attention, meditation and signal quality
+    line_attention.set_ydata(attention_buf[start:end])
+    line_meditation.set_ydata(meditation_buf[start:end])
+    line_signal.set_ydata(signal_buf[start:end])
     
-    # Update band data - only rescale every 50 frames
-    for band in BANDS:
-        key = band["key"]
-        if len(band_data[key]) > 0:
-            x = np.arange(len(band_data[key]))
-            lines[key].set_data(x, list(band_data[key]))
-            updated_lines.append(lines[key])
-            
-            # Auto-scale only occasionally
-            if frame % 50 == 0 and len(band_data[key]) > 10:
-                max_val = max(band_data[key])
-                if max_val > 0:
-                    axes[key].set_ylim(0, max_val * 1.2)
+    # Update band data - axis limits stay fixed so blitting keeps its fast path
+    for line, y in zip(band_lines, band_buf[:, start:end]):
+        line.set_ydata(y)
+
+def draw_animated():
+    """Draw the animated artists on top of the current canvas contents"""
+    for line in all_lines:
+        fig.draw_artist(line)
+    fig.draw_artist(status_text)
+
+def on_draw(event):
+    """Re-capture the blit background after every full redraw (resize, rescale)"""
+    global blit_bg
+    blit_bg = fig.canvas.copy_from_bbox(fig.bbox)
+    draw_animated()
+
+def render_frame():
+    """Blit the plots, but only when new data (or status) arrived since last frame"""
+    global need_redraw
     
-    # Update status text only every 10 frames
-    if frame % 10 == 0:
-        update_status_text()
+    if not need_redraw or blit_bg is None:
+        return
+    need_redraw = False
     
-    return updated_lines
+    update_lines()
+    fig.canvas.restore_region(blit_bg)
+    draw_animated()
+    fig.canvas.blit(fig.bbox)
 
 def run_websocket():
     """Run WebSocket client in separate thread"""
@@ -244,13 +350,15 @@ def run_websocket():
                 on_close=on_close
             )
             ws.run_forever()
-        except Exception as e:
+        except (websocket.WebSocketException, OSError) as e:
             print(f"⚠️ Exception: {e}")
         
         print("🔄 Reconnecting in 3s...")
         time.sleep(3)
 
-# Start WebSocket in background thread
+# Start WebSocket and message consumer in background threads
+consumer_thread = threading.Thread(target=consume_messages, daemon=True)
+consumer_thread.start()
 ws_thread = threading.Thread(target=run_websocket, daemon=True)
 ws_thread.start()
 
@@ -261,19 +369,27 @@ print(f"📡 Connecting to: {WS_URL}")
 print(f"📝 Logging to: {csv_filename}")
 print("\n💡 Close the plot window to stop\n")
 
-# Start animation with optimized interval
+# Event-driven rendering: timers only blit when new data arrived
 try:
-    ani = animation.FuncAnimation(
-        fig, animate, 
-        interval=100,  # Update every 100ms (10 FPS) instead of 50ms
-        blit=True,     # Use blitting for faster rendering
-        cache_frame_data=False
-    )
+    fig.canvas.mpl_connect('draw_event', on_draw)
+    timers = []
+    for interval, callback in ((RENDER_INTERVAL_MS, render_frame),
+                               (STATUS_INTERVAL_MS, on_status_timer),
+                               (RESCALE_INTERVAL_MS, rescale_band_axes)):
+        timer = fig.canvas.new_timer(interval=interval)
+        timer.add_callback(callback)
+        timer.start()
+        timers.append(timer)  # Keep references so timers are not collected
     plt.tight_layout()
     plt.show()
 except KeyboardInterrupt:
     print("\n⏹ Stopped by user")
 finally:
+    if _csv_batch:
+        csv_writer.writerows(_csv_batch)
+        _csv_batch.clear()
+    csvfile.flush()
+    os.fsync(csvfile.fileno())  # Durable once, at shutdown only
     csvfile.close()
     print(f"\n✅ Data saved to: {csv_filename}")
     print(f"📊 Total packets: {packet_count}")
\ No newline at end of file
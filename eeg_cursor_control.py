@@ -3,69 +3,274 @@ EEG Real-time Cursor Control - Debug Version
 Controls mouse cursor using Signal-Focused ML Model
 """
 
+import os
+import sys
 import websocket
+import socket
+import struct
 import json
 import time
 import threading
+import warnings
 from collections import deque
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pyautogui
 import numpy as np
-import pickle
+import joblib
+from typing import NamedTuple, Optional
+
+# Optional faster JSON decoder for the per-packet hot path
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Optional typed decoder: parses packets straight into a fixed-field struct
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Optional ONNX Runtime backend, used when an .onnx export sits next to the .pkl
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+# Optional compiled tree-ensemble backend, used when the trainer built a treelite library
+try:
+    import tl2cgen
+except ImportError:
+    tl2cgen = None
+
+# Optional JIT for the per-tick feature kernel; runs as plain Python without numba
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+    def njit(*args, **kwargs):
+        return lambda f: f
 
 # Configuration
 ESP32_IP = "NeuroCursor-esp.local"
 WS_PORT = 81
 WS_URL = f"ws://{ESP32_IP}:{WS_PORT}"
+RECONNECT_MIN_S = 2 # First retry delay, doubled per failed attempt
+RECONNECT_MAX_S = 30
+PING_INTERVAL_S = 5 # Keepalive so a half-open connection is noticed quickly
+PING_TIMEOUT_S = 3
+# Send small frames immediately instead of waiting on Nagle's algorithm
+WS_SOCKOPT = ((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),)
+
+# Binary frame sent when the firmware is built with BINARY_FRAMES=1:
+# sig, att, med, raw as int16 followed by the 8 band powers as uint32 (little-endian),
+# i.e. exactly DATA_KEYS order
+BINARY_FRAME = struct.Struct("<4h8I")
 
 # Control settings
 MOVEMENT_SPEED = 15
 SMOOTHING_WINDOW = 3 # Slightly faster response
+PREDICT_BATCH = 4 # Ticks scored together in one predict_proba call
+CONTROL_PERIOD_S = 0.15 # Faster polling
+POOR_SIGNAL_WAIT_S = 0.5
+
+# Console settings
+LOG_FLUSH_MS = 500 # Queued log lines are written to the console this often
+LOG_MAX_LINES = 100
+PROB_UPDATE_S = 0.5 # Minimum gap between probability label refreshes
+DEBUG = False # Also print log lines to stdout
+
+# Recent EEG packets, one row per packet and one column per key (index with KIDX).
+# on_message fills the next row and only then bumps packet_count, so the newest
+# row is always complete and readers never need a lock.
+DATA_KEYS = ('sig', 'att', 'med', 'raw', 'delta', 'theta', 'la', 'ha', 'lb', 'hb', 'lg', 'mg')
+KIDX = {k: i for i, k in enumerate(DATA_KEYS)}
+PACKET_RING = 256
+packet_buf = np.zeros((PACKET_RING, len(DATA_KEYS)), dtype=np.float32)
+packet_buf[0, KIDX['sig']] = 200
+packet_count = 1 # Packets published so far; newest is row (packet_count - 1) % PACKET_RING
+
+if msgspec is not None:
+    # Fields in DATA_KEYS order; None marks a key the packet didn't carry
+    EegFrame = msgspec.defstruct("EegFrame", [(k, Optional[float], None) for k in DATA_KEYS])
+    decode_frame = msgspec.json.Decoder(EegFrame).decode
+    frame_values = msgspec.structs.astuple
+    DECODE_ERRORS = (ValueError, TypeError, AttributeError, struct.error, msgspec.DecodeError)
+else:
+    decode_frame = None
+    DECODE_ERRORS = (ValueError, TypeError, AttributeError, struct.error)
 
-# Current EEG data
-current_data = {
-    "sig": 200, "att": 0, "med": 0, "raw": 0,
-    "delta": 0, "theta": 0, "la": 0, "ha": 0,
-    "lb": 0, "hb": 0, "lg": 0, "mg": 0
-}
 # Baseline data for normalization (updated via calibrate)
 baseline_data = {"att": 30, "med": 30, "la": 5000, "ha": 5000, "lb": 3000, "hb": 3000}
-data_lock = threading.Lock()
+baseline_group = np.zeros(4, dtype=np.float32) # (att, med, alpha, beta) baseline for predict()
+
+def update_baseline_group():
+    b = baseline_data
+    baseline_group[:] = (b['att'], b['med'], b['la'] + b['ha'], b['lb'] + b['hb'])
+
+update_baseline_group()
 ws_connected = False
+data_evt = threading.Event() # Set by on_message on every packet
+
+def latest_packet():
+    """View of the newest complete packet row"""
+    return packet_buf[(packet_count - 1) % PACKET_RING]
+
+def read_current():
+    """Copy of the newest packet, taken long before the writer wraps around to it"""
+    return latest_packet().copy()
+
+# Calibration: on_message sums FEATURE_KEYS from good-signal packets while active
+cal_lock = threading.Lock()
+cal_active = False
+cal_sum = np.zeros(6, dtype=np.float64)
+cal_n = 0
 
 # Control state
 control_active = False
 loaded_model = None
-prediction_buffer = deque(maxlen=SMOOTHING_WINDOW)
 
-# Feature smoothing
+# Direction voting: predictions are stored as indices into DIRS
+DIRS = ('IDLE', 'UP', 'DOWN', 'LEFT', 'RIGHT')
+DIR_IDX = {d: i for i, d in enumerate(DIRS)}
+DIR_COLORS = {"UP": "#2ecc71", "DOWN": "#f39c12", "LEFT": "#3498db", "RIGHT": "#e74c3c", "IDLE": "#95a5a6"}
+pred_ring = np.zeros(SMOOTHING_WINDOW, dtype=np.int8)
+pred_count = 0
+vote_counts = [0] * len(DIRS) # Votes per direction currently in pred_ring
+top_vote = 0 # DIRS index with the most votes (lowest index on ties)
+
+# Feature smoothing: one ring buffer row per feature, one column per tick
 FEATURE_SMOOTH_WINDOW = 3
-feature_buffers = {
-    'att': deque(maxlen=FEATURE_SMOOTH_WINDOW),
-    'med': deque(maxlen=FEATURE_SMOOTH_WINDOW),
-    'la': deque(maxlen=FEATURE_SMOOTH_WINDOW),
-    'ha': deque(maxlen=FEATURE_SMOOTH_WINDOW),
-    'lb': deque(maxlen=FEATURE_SMOOTH_WINDOW),
-    'hb': deque(maxlen=FEATURE_SMOOTH_WINDOW),
-}
+FEATURE_KEYS = ('att', 'med', 'la', 'ha', 'lb', 'hb')
+feature_buf = np.zeros((len(FEATURE_KEYS), FEATURE_SMOOTH_WINDOW), dtype=np.float32)
+feature_count = 0  # Ticks written so far; slot is feature_count % FEATURE_SMOOTH_WINDOW
+FEATURE_IDX = np.array([KIDX[k] for k in FEATURE_KEYS], dtype=np.intp)
 
 def update_feature_buffers():
-    with data_lock:
-        feature_buffers['att'].append(current_data['att'])
-        feature_buffers['med'].append(current_data['med'])
-        feature_buffers['la'].append(current_data['la'])
-        feature_buffers['ha'].append(current_data['ha'])
-        feature_buffers['lb'].append(current_data['lb'])
-        feature_buffers['hb'].append(current_data['hb'])
+    global feature_count
+    feature_buf[:, feature_count % FEATURE_SMOOTH_WINDOW] = read_current()[FEATURE_IDX]
+    feature_count += 1
+
+class Smoothed(NamedTuple):
+    """Smoothed features, fields in FEATURE_KEYS order"""
+    att: float
+    med: float
+    la: float
+    ha: float
+    lb: float
+    hb: float
 
 def get_smoothed_data():
-    smoothed = {}
-    for key, buffer in feature_buffers.items():
-        smoothed[key] = sum(buffer) / len(buffer) if buffer else 0
-    return smoothed
+    n = min(feature_count, FEATURE_SMOOTH_WINDOW)
+    if n == 0:
+        return Smoothed(0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+    return Smoothed._make(feature_buf[:, :n].mean(axis=1).tolist())
+
+# Features computed by predict(), in the order they are written to the input buffer
+PREDICT_FEATURES = (
+    'attention', 'meditation', 'low_alpha', 'high_alpha', 'low_beta', 'high_beta',
+    'norm_att', 'norm_med', 'norm_alpha', 'norm_beta',
+    'beta_alpha_ratio', 'engagement_ratio'
+)
+
+# Purification masks, one row per DIRS entry: which smoothed features (FEATURE_KEYS
+# order) and which baseline deltas (att, med, alpha, beta) the model gets to see
+PURIFY_MASK = np.array([
+    [1, 1, 1, 1, 1, 1],  # IDLE keeps every signal
+    [1, 0, 0, 0, 0, 0],  # UP
+    [0, 1, 0, 0, 0, 0],  # DOWN
+    [0, 0, 1, 1, 0, 0],  # LEFT
+    [0, 0, 0, 0, 1, 1],  # RIGHT
+], dtype=np.float32)
+NORM_MASK = np.array([
+    [1, 1, 1, 1],
+    [1, 0, 0, 0],
+    [0, 1, 0, 0],
+    [0, 0, 1, 0],
+    [0, 0, 0, 1],
+], dtype=np.float32)
+
+@njit(cache=True)
+def _build_features(raw, base_group, out):
+    """Purify smoothed features into out (PREDICT_FEATURES order), return the DIRS index"""
+    # Pick the signal most elevated above baseline (first wins on ties)
+    deltas = np.array([raw[0], raw[1], raw[2] + raw[3], raw[4] + raw[5]]) - base_group
+    i = np.argmax(deltas)
+    # Safety: If nothing is really elevated, it's likely IDLE
+    best = 0 if deltas[i] < 5 else i + 1
+    
+    # Zero out what the model thinks should be 0
+    p = raw * PURIFY_MASK[best]
+    out[:6] = p
+    group = np.array([p[0], p[1], p[2] + p[3], p[4] + p[5]])
+    out[6:10] = (group - base_group) * NORM_MASK[best]
+    out[10] = group[3] / (group[2] + 1)
+    out[11] = p[0] / (p[1] + 1)
+    return best
+
+@njit(cache=True)
+def _bin_inputs(X, edges, edge_offsets, out):
+    """Replace each feature with the number of that feature's split values below it"""
+    for f in range(X.shape[1]):
+        out[:, f] = np.searchsorted(edges[edge_offsets[f]:edge_offsets[f + 1]], X[:, f])
+
+@njit(cache=True)
+def _forest_proba(qx, roots, left, right, feature, threshold, value, out):
+    """Average the quantized trees' leaf distributions for each row of binned qx into out"""
+    out[:] = 0.0
+    for row in range(qx.shape[0]):
+        for root in roots:
+            node = root
+            while left[node] != -1:
+                if qx[row, feature[node]] <= threshold[node]: node = left[node]
+                else: node = right[node]
+            out[row] += value[node]
+    out /= 255.0 * len(roots)
 
-pyautogui.FAILSAFE = True
+# Cursor movement: bind the native OS call once, pyautogui only as a fallback
+def bind_cursor():
+    """Return (move_fn(dx, dy), cursor_pos(), (screen_w, screen_h)) for this platform"""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            user32 = ctypes.windll.user32
+            pt = wintypes.POINT()
+            def cursor_pos():
+                user32.GetCursorPos(ctypes.byref(pt))
+                return pt.x, pt.y
+            # Absolute SetCursorPos, so moves are exact pixels: relative SendInput
+            # motion would get the user's pointer speed and acceleration applied
+            pt_ref, get_pos, set_pos = ctypes.byref(pt), user32.GetCursorPos, user32.SetCursorPos
+            def move_fn(dx, dy):
+                get_pos(pt_ref)
+                set_pos(pt.x + dx, pt.y + dy)
+            screen = (user32.GetSystemMetrics(0), user32.GetSystemMetrics(1)) # SM_CXSCREEN, SM_CYSCREEN
+            return move_fn, cursor_pos, screen
+        if sys.platform.startswith("linux"):
+            from Xlib import display as xdisplay
+            disp = xdisplay.Display()
+            scr = disp.screen()
+            root_win = scr.root
+            def cursor_pos():
+                p = root_win.query_pointer()
+                return p.root_x, p.root_y
+            def move_fn(dx, dy):
+                disp.warp_pointer(dx, dy) # No destination window: relative move
+                disp.flush()
+            return move_fn, cursor_pos, (scr.width_in_pixels, scr.height_in_pixels)
+    except Exception as e:
+        print(f"⚠️ Native cursor control unavailable ({e}), using pyautogui")
+    
+    import pyautogui
+    pyautogui.FAILSAFE = True
+    return pyautogui.move, pyautogui.position, tuple(pyautogui.size())
+
+move_fn, cursor_pos, (screen_w, screen_h) = bind_cursor()
+# Same corners as pyautogui.FAILSAFE_POINTS
+FAILSAFE_POINTS = {(0, 0), (0, screen_h - 1), (screen_w - 1, 0), (screen_w - 1, screen_h - 1)}
 
 class CursorControlApp:
     def __init__(self, root):
@@ -123,6 +328,12 @@ class CursorControlApp:
                                   font=("Consolas", 9), bg="#f0f0f0", fg="#34495e")
         self.prob_label.pack(pady=5)
         
+        # Bound configure methods for the widgets refreshed while control runs
+        self._status_cfg = self.status_label.configure
+        self._p_cfg = self.p_label.configure
+        self._prob_cfg = self.prob_label.configure
+        self._p_text = "READY"
+        
         # Controls
         b_frame = tk.Frame(main_frame, bg="#f0f0f0")
         b_frame.pack(pady=10)
@@ -134,69 +345,167 @@ class CursorControlApp:
         # Bottom Console
         self.console = tk.Text(main_frame, height=4, bg="#1e1e1e", fg="#00ff00", font=("Consolas", 9))
         self.console.pack(fill="x", pady=5)
+        self._log_q = deque(maxlen=LOG_MAX_LINES)
         self.log("System initialized. Calibrate and Load Model to start.")
         
+        # (connected, sig, att, med, alpha, beta) last shown on screen
+        self._last_render = (None,) * 6
+        self._stop_evt = threading.Event()
+        self._last_prob_text = ""
+        self._last_prob_ts = 0.0
         self.update_ui()
+        self.flush_log()
 
     def log(self, msg):
-        self.console.insert(tk.END, f"> {msg}\n")
-        self.console.see(tk.END)
-        print(f"DEBUG: {msg}")
+        # Safe from any thread; flush_log writes the queue to the console
+        self._log_q.append(f"> {msg}\n")
+        if DEBUG: print(f"DEBUG: {msg}")
+
+    def flush_log(self):
+        q = self._log_q
+        if q:
+            lines = [q.popleft() for _ in range(len(q))]
+            self.console.insert(tk.END, "".join(lines))
+            self.console.delete("1.0", f"end-{LOG_MAX_LINES + 1}l")
+            self.console.see(tk.END)
+        self.root.after(LOG_FLUSH_MS, self.flush_log)
 
     def load_model(self):
         global loaded_model
         path = filedialog.askopenfilename(filetypes=[("Model files", "*.pkl")])
         if path:
             try:
-                with open(path, 'rb') as f: loaded_model = pickle.load(f)
+                # Arrays of uncompressed models (COMPRESS_MODEL = False in the trainer) are
+                # memory-mapped instead of copied in; compressed ones are read normally
+                with warnings.catch_warnings():
+                    warnings.filterwarnings("ignore", message='mmap_mode "r" is not compatible')
+                    loaded_model = joblib.load(path, mmap_mode='r')
+                self.prepare_inputs(loaded_model['feature_names'], loaded_model['scaler'])
+                self.select_backend(path)
                 self.log(f"Model loaded: {path.split('/')[-1]}")
                 messagebox.showinfo("Success", "Model loaded successfully!")
             except Exception as e: 
                 self.log(f"Error loading model: {e}")
                 messagebox.showerror("Error", f"Failed: {e}")
 
+    def select_backend(self, path):
+        """Pick the fastest predict_proba available: compiled trees, quantized forest, ONNX, then sklearn"""
+        self._proba = loaded_model['model'].predict_proba
+        
+        lib = loaded_model.get('treelite_lib')
+        lib_path = os.path.join(os.path.dirname(path), lib) if lib else ""
+        if tl2cgen is not None and lib and os.path.exists(lib_path):
+            predictor = tl2cgen.Predictor(lib_path)
+            # (rows, targets, classes) -> (rows, classes), columns in classes_ order
+            self._proba = lambda X: predictor.predict(tl2cgen.DMatrix(X)).reshape(len(X), -1)
+            self.log(f"Compiled trees enabled: {lib}")
+            return
+        
+        # The interpreted traversal is far slower than sklearn, so only use it compiled
+        qf = loaded_model.get('quantized_forest')
+        if HAVE_NUMBA and qf is not None and 'edges' in qf:
+            trees = (qf['roots'], qf['left'], qf['right'], qf['feature'], qf['threshold'], qf['value'])
+            edges, edge_offsets, n_classes = qf['edges'], qf['edge_offsets'], len(qf['classes'])
+            # Input bins share the thresholds' dtype (int32 for features with >32767 splits)
+            qx = np.empty((PREDICT_BATCH, len(edge_offsets) - 1), dtype=qf['threshold'].dtype)
+            def proba(X):
+                _bin_inputs(X, edges, edge_offsets, qx)
+                out = np.empty((len(X), n_classes))
+                _forest_proba(qx, *trees, out)
+                return out
+            self._proba = proba
+            self.log("Quantized forest enabled")
+            return
+        
+        onnx_path = os.path.splitext(path)[0] + ".onnx"
+        if ort is not None and os.path.exists(onnx_path):
+            sess = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+            name = sess.get_inputs()[0].name
+            # Outputs are (labels, probabilities), columns in classes_ order
+            self._proba = lambda X: sess.run(None, {name: X})[1]
+            self.log(f"ONNX runtime enabled: {os.path.basename(onnx_path)}")
+
+    def prepare_inputs(self, f_names, scaler):
+        """Map PREDICT_FEATURES onto the model's feature columns once per model"""
+        slots = {name: i for i, name in enumerate(f_names)}
+        # Unrolled copy of the features this model uses into its own column order
+        body = [f"    row[{slots[name]}] = feats[{i}]" for i, name in enumerate(PREDICT_FEATURES) if name in slots]
+        ns = {}
+        exec("def _fill(feats, row):\n" + ("\n".join(body) or "    pass"), ns)
+        self._fill = ns['_fill']
+        self._feats = np.zeros(len(PREDICT_FEATURES), dtype=np.float32)
+        # Models trained on PREDICT_FEATURES as-is get features written straight into the batch
+        self._direct = tuple(f_names) == PREDICT_FEATURES
+        # One row per tick of the batch; model features we don't compute stay 0
+        self._batch = np.zeros((PREDICT_BATCH, len(f_names)), dtype=np.float32)
+        self._batch_i = 0
+        self._last_dir = "IDLE"
+        self._pred_key = None # Rounded smoothed features of the last scored tick
+        self._last_seq = 0 # packet_count seen by the last predict
+        # StandardScaler parameters, applied in place instead of scaler.transform()
+        self._mean = scaler.mean_.astype(np.float32)
+        self._inv_scale = (1.0 / scaler.scale_).astype(np.float32)
+        self._batch_s = np.empty_like(self._batch)
+        # Plain str labels and a reusable probability row for the decision
+        self._classes = loaded_model['model'].classes_.tolist()
+        self._probs = np.empty(len(self._classes), dtype=np.float64)
+        # IDLE gate, only usable if it learned both classes; _gate_col is its "active" column
+        gater = loaded_model.get('gater')
+        self._gate = None
+        if gater is not None and len(gater.classes_) == 2:
+            self._gate = gater.predict_proba
+            self._gate_col = gater.classes_.tolist().index(True)
+
     def calibrate(self):
+        global cal_active, cal_n
         if not ws_connected: return messagebox.showerror("Error", "Connect first!")
         self.cal_btn.config(text="⏳ Calibrating...", state="disabled")
         self.log("Calibration started... stay relaxed.")
+        with cal_lock:
+            cal_sum[:] = 0
+            cal_n = 0
+            cal_active = True
+        self.root.after(5000, self.finish_calibration)
+
+    def finish_calibration(self):
+        global cal_active
+        with cal_lock:
+            cal_active = False
+            if cal_n:
+                baseline_data.update(zip(FEATURE_KEYS, (cal_sum / cal_n).tolist()))
+                update_baseline_group()
+        self._pred_key = self._last_seq = None
         
-        def run():
-            tmp = {'att':[], 'med':[], 'la':[], 'ha':[], 'lb':[], 'hb':[]}
-            start = time.time()
-            while time.time() - start < 5:
-                if current_data['sig'] < 100:
-                    with data_lock:
-                        for k in tmp: tmp[k].append(current_data.get(k, 0))
-                time.sleep(0.1)
-            
-            if tmp['att']:
-                with data_lock:
-                    for k in tmp:
-                        if tmp[k]: baseline_data[k] = sum(tmp[k]) / len(tmp[k])
-                self.log(f"Calibration done! Baseline: Att={baseline_data['att']:.1f}, Med={baseline_data['med']:.1f}")
-                self.root.after(0, lambda: messagebox.showinfo("Done", "Baseline Calibrated!"))
-            else:
-                self.log("Calibration failed: Poor signal.")
-            
-            self.root.after(0, lambda: self.cal_btn.config(text="⚖️ Calibrate Baseline", state="normal"))
-            
-        threading.Thread(target=run, daemon=True).start()
+        if cal_n:
+            self.log(f"Calibration done! Baseline: Att={baseline_data['att']:.1f}, Med={baseline_data['med']:.1f}")
+            messagebox.showinfo("Done", "Baseline Calibrated!")
+        else:
+            self.log("Calibration failed: Poor signal.")
+        
+        self.cal_btn.config(text="⚖️ Calibrate Baseline", state="normal")
 
     def update_ui(self):
-        with data_lock:
+        vals = read_current()
+        sig, att, med, la, ha, lb, hb = (int(vals[KIDX[k]]) for k in ('sig', 'att', 'med', 'la', 'ha', 'lb', 'hb'))
+        cur = (ws_connected, sig, att, med, la + ha, lb + hb)
+        last = self._last_render
+        self.root.after(100, self.update_ui)
+        if cur == last: return
+        self._last_render = cur
+        
+        # Only reconfigure the widgets whose values changed
+        if cur[0] != last[0]:
             status = "🟢 Connected" if ws_connected else "🔴 Disconnected"
             color = "#27ae60" if ws_connected else "#e74c3c"
-            self.status_label.config(text=status, fg=color)
-            
-            sig = current_data['sig']
+            self._status_cfg(text=status, fg=color)
+        
+        if sig != last[1]:
             self.q_bar['value'] = max(0, 100 - (sig / 2))
             self.q_text.config(text=f"{sig}", fg="#27ae60" if sig < 50 else "#e67e22" if sig < 100 else "#e74c3c")
-            
-            alpha = current_data['la'] + current_data['ha']
-            beta = current_data['lb'] + current_data['hb']
-            self.val_label.config(text=f"Att: {current_data['att']} | Med: {current_data['med']} | Alpha: {alpha} | Beta: {beta}")
-            
-        self.root.after(100, self.update_ui)
+        
+        if cur[2:] != last[2:]:
+            alpha, beta = cur[4], cur[5]
+            self.val_label.config(text=f"Att: {att} | Med: {med} | Alpha: {alpha} | Beta: {beta}")
 
     def start_control(self):
         global control_active
@@ -205,29 +514,51 @@ class CursorControlApp:
         self.start_btn.config(state="disabled")
         self.stop_btn.config(state="normal")
         self.log("Cursor control STARTED.")
+        self._stop_evt = threading.Event()
         threading.Thread(target=self.control_loop, daemon=True).start()
 
     def stop_control(self):
         global control_active
         control_active = False
+        self._stop_evt.set()
+        data_evt.set()
         self.start_btn.config(state="normal")
         self.stop_btn.config(state="disabled")
-        self.p_label.config(text="STOPPED", fg="#95a5a6")
+        self.set_prediction("STOPPED", "#95a5a6")
         self.log("Cursor control STOPPED.")
 
     def control_loop(self):
+        global pred_count, top_vote
+        stop_evt = self._stop_evt
+        next_tick = time.monotonic()
         while control_active:
-            if current_data['sig'] > 120:
-                self.root.after(0, lambda: self.p_label.config(text="POOR SIGNAL", fg="#e74c3c"))
-                time.sleep(0.5); continue
+            # Only tick on data newer than the last tick; stop_control also sets data_evt
+            data_evt.wait()
+            if not control_active: return
+            data_evt.clear()
+            
+            if latest_packet()[KIDX['sig']] > 120:
+                self.root.after(0, self.set_prediction, "POOR SIGNAL", "#e74c3c")
+                if stop_evt.wait(POOR_SIGNAL_WAIT_S): return
+                next_tick = time.monotonic()
+                continue
             
             direction = self.predict()
-            prediction_buffer.append(direction)
+            # Simple voting for smoothing: keep the tally current instead of recounting
+            d = DIR_IDX[direction]
+            slot = pred_count % SMOOTHING_WINDOW
+            old = int(pred_ring[slot]) if pred_count >= SMOOTHING_WINDOW else -1
+            if old >= 0: vote_counts[old] -= 1
+            pred_ring[slot] = d
+            vote_counts[d] += 1
+            pred_count += 1
+            if old == top_vote:
+                top_vote = vote_counts.index(max(vote_counts))
+            elif vote_counts[d] > vote_counts[top_vote] or (vote_counts[d] == vote_counts[top_vote] and d < top_vote):
+                top_vote = d
             
-            # Simple voting for smoothing
-            if len(prediction_buffer) >= SMOOTHING_WINDOW:
-                from collections import Counter
-                final_dir = Counter(prediction_buffer).most_common(1)[0][0]
+            if pred_count >= SMOOTHING_WINDOW:
+                final_dir = DIRS[top_vote]
             else:
                 final_dir = direction
             
@@ -235,114 +566,149 @@ class CursorControlApp:
             if final_dir != "IDLE": 
                 self.move_cursor(final_dir)
             
-            time.sleep(0.15) # Faster polling
+            # At most one tick per CONTROL_PERIOD_S, paced from a fixed schedule
+            next_tick += CONTROL_PERIOD_S
+            wait = next_tick - time.monotonic()
+            if wait <= 0:
+                next_tick = time.monotonic() # Fell behind; don't burst to catch up
+            elif stop_evt.wait(wait):
+                return
 
     def predict(self):
         if not loaded_model: return "IDLE"
+        # No packet since the last call: nothing new to smooth or score
+        seq = packet_count
+        if seq == self._last_seq: return self._last_dir
+        self._last_seq = seq
         update_feature_buffers()
         s = get_smoothed_data()
         
+        # Features barely moved since the last tick: keep the last decision
+        key = (round(s.att), round(s.med), round(s.la / 100), round(s.ha / 100),
+               round(s.lb / 100), round(s.hb / 100))
+        if key == self._pred_key: return self._last_dir
+        self._pred_key = key
+        
         # 1. SOFT PURIFICATION (Match training set expectation of "ignore others")
         # During training, we zeroed out irrelevant signals. 
-        # We find which one is the most dominant relative to baseline.
-        
-        att = s['att']
-        med = s['med']
-        la, ha = s['la'], s['ha']
-        lb, hb = s['lb'], s['hb']
-        alpha = la + ha
-        beta = lb + hb
-        
-        n_att = att - baseline_data['att']
-        n_med = med - baseline_data['med']
-        n_alpha = alpha - (baseline_data['la'] + baseline_data['ha'])
-        n_beta = beta - (baseline_data['lb'] + baseline_data['hb'])
-        
-        signals = {'UP': n_att, 'DOWN': n_med, 'LEFT': n_alpha, 'RIGHT': n_beta}
-        best_candidate = max(signals, key=signals.get)
-        
-        # Safety: If nothing is really elevated, it's likely IDLE
-        if signals[best_candidate] < 5: 
-            best_candidate = "IDLE"
-
-        # Apply purification: Zero out what the model thinks should be 0
-        p_att = att if best_candidate == "UP" else 0
-        p_med = med if best_candidate == "DOWN" else 0
-        p_la = la if best_candidate == "LEFT" else 0
-        p_ha = ha if best_candidate == "LEFT" else 0
-        p_lb = lb if best_candidate == "RIGHT" else 0
-        p_hb = hb if best_candidate == "RIGHT" else 0
-        
-        # If IDLE, keep some baseline signal
-        if best_candidate == "IDLE":
-            p_att, p_med, p_la, p_ha, p_lb, p_hb = att, med, la, ha, lb, hb
-
-        input_data = {
-            'attention': p_att, 'meditation': p_med,
-            'low_alpha': p_la, 'high_alpha': p_ha,
-            'low_beta': p_lb, 'high_beta': p_hb,
-            'norm_att': p_att - baseline_data['att'] if best_candidate in ["UP", "IDLE"] else 0,
-            'norm_med': p_med - baseline_data['med'] if best_candidate in ["DOWN", "IDLE"] else 0,
-            'norm_alpha': (p_la + p_ha) - (baseline_data['la'] + baseline_data['ha']) if best_candidate in ["LEFT", "IDLE"] else 0,
-            'norm_beta': (p_lb + p_hb) - (baseline_data['lb'] + baseline_data['hb']) if best_candidate in ["RIGHT", "IDLE"] else 0,
-            'beta_alpha_ratio': (p_lb + p_hb) / (p_la + p_ha + 1),
-            'engagement_ratio': p_att / (p_med + 1)
-        }
-        
-        m = loaded_model['model']
-        scaler = loaded_model['scaler']
-        f_names = loaded_model['feature_names']
+        # _build_features finds which one is the most dominant relative to baseline.
+        # Queue this tick; the model only runs once the batch is full
+        raw = np.array(s, dtype=np.float32)
+        if self._direct:
+            _build_features(raw, baseline_group, self._batch[self._batch_i])
+        else:
+            _build_features(raw, baseline_group, self._feats)
+            self._fill(self._feats, self._batch[self._batch_i])
+        self._batch_i += 1
+        if self._batch_i < PREDICT_BATCH:
+            return self._last_dir
+        self._batch_i = 0
         
         try:
-            vec = np.array([input_data.get(f, 0) for f in f_names]).reshape(1, -1)
-            vec_s = scaler.transform(vec)
-            probs = m.predict_proba(vec_s)[0]
+            batch_s = self._batch_s
+            np.subtract(self._batch, self._mean, out=batch_s)
+            np.multiply(batch_s, self._inv_scale, out=batch_s)
+            # Cheap gate first: a clearly idle window never reaches the main model
+            if self._gate is not None and self._gate(batch_s)[:, self._gate_col].mean() < 0.5:
+                self._last_dir = "IDLE"
+                return self._last_dir
+            # Average the batch's probabilities into one decision for the window
+            probs = np.mean(self._proba(batch_s), axis=0, out=self._probs)
             
             # Update Debug Probabilities UI
-            prob_text = "Probabilities: " + " | ".join([f"{c}: {p*100:.0f}%" for c, p in zip(m.classes_, probs)])
-            self.root.after(0, lambda t=prob_text: self.prob_label.config(text=t))
+            now = time.monotonic()
+            if now - self._last_prob_ts > PROB_UPDATE_S:
+                prob_text = "Probabilities: " + " | ".join([f"{c}: {p*100:.0f}%" for c, p in zip(self._classes, probs)])
+                if prob_text != self._last_prob_text:
+                    self._last_prob_text, self._last_prob_ts = prob_text, now
+                    self.root.after(0, self._prob_cfg, {"text": prob_text})
             
             # Lower confidence threshold for smoother movement
-            if np.max(probs) < 0.35: 
-                return "IDLE"
-            
-            return m.classes_[np.argmax(probs)]
+            idx = int(probs.argmax())
+            self._last_dir = "IDLE" if probs[idx] < 0.35 else self._classes[idx]
+            return self._last_dir
         except Exception as e:
             # print(f"Prediction error: {e}")
             return "IDLE"
 
     def update_prediction_display(self, direction):
-        colors = {"UP": "#2ecc71", "DOWN": "#f39c12", "LEFT": "#3498db", "RIGHT": "#e74c3c", "IDLE": "#95a5a6"}
-        self.p_label.config(text=direction, fg=colors.get(direction, "white"))
+        self.set_prediction(direction, DIR_COLORS.get(direction, "white"))
+
+    def set_prediction(self, text, fg):
+        # The same direction repeats most ticks; only touch the label on change
+        if text == self._p_text: return
+        self._p_text = text
+        self._p_cfg(text=text, fg=fg)
 
     def move_cursor(self, direction):
         speed = self.speed_var.get()
         try:
-            if direction == "LEFT": pyautogui.move(-speed, 0)
-            elif direction == "RIGHT": pyautogui.move(speed, 0)
-            elif direction == "UP": pyautogui.move(0, -speed)
-            elif direction == "DOWN": pyautogui.move(0, speed)
+            # Fail-safe: parking the cursor in any screen corner stops control (checked before every move)
+            if tuple(cursor_pos()) in FAILSAFE_POINTS:
+                raise RuntimeError("Fail-safe triggered from the screen corner")
+            if direction == "LEFT": move_fn(-speed, 0)
+            elif direction == "RIGHT": move_fn(speed, 0)
+            elif direction == "UP": move_fn(0, -speed)
+            elif direction == "DOWN": move_fn(0, speed)
             self.log(f"MOVED {direction}")
         except Exception as e:
             self.log(f"Move Error: {e}")
             self.stop_control()
 
-def on_message(ws, msg):
+def on_message(ws, msg, _loads=json_loads, _decode=decode_frame, _unpack=BINARY_FRAME.unpack, _kidx=KIDX,
+               _buf=packet_buf, _ring=PACKET_RING, _cal_sum=cal_sum, _feature_idx=FEATURE_IDX,
+               _notify=data_evt.set):
+    global packet_count, cal_n
     try:
-        data = json.loads(msg)
-        with data_lock: current_data.update(data)
-    except: pass
+        n = packet_count
+        row = _buf[n % _ring]
+        if isinstance(msg, bytes):
+            # Binary frame: every field, already in DATA_KEYS order
+            row[:] = _unpack(msg)
+        elif _decode is not None:
+            vals = frame_values(_decode(msg))
+            if None in vals:
+                # Keys missing from a packet keep their previous value
+                row[:] = _buf[(n - 1) % _ring]
+                for i, v in enumerate(vals):
+                    if v is not None: row[i] = v
+            else:
+                row[:] = vals
+        else:
+            data = _loads(msg)
+            row[:] = _buf[(n - 1) % _ring]
+            for k, v in data.items():
+                i = _kidx.get(k)
+                if i is not None: row[i] = v
+        # Publish only once the row is complete
+        packet_count = n + 1
+        _notify()
+        if cal_active and row[_kidx['sig']] < 100:
+            with cal_lock:
+                _cal_sum += row[_feature_idx]
+                cal_n += 1
+    except DECODE_ERRORS: pass
 
-def on_open(ws): global ws_connected; ws_connected = True
+def on_open(ws):
+    global ws_connected, reconnect_delay
+    ws_connected = True
+    reconnect_delay = RECONNECT_MIN_S
 def on_close(ws, c1, c2): global ws_connected; ws_connected = False
 
+reconnect_delay = RECONNECT_MIN_S
+
 def run_ws():
+    global reconnect_delay
+    # One app for the whole session; each run_forever() opens a fresh socket on it
+    ws = websocket.WebSocketApp(WS_URL, on_message=on_message, on_open=on_open, on_close=on_close)
     while True:
         try:
-            ws = websocket.WebSocketApp(WS_URL, on_message=on_message, on_open=on_open, on_close=on_close)
-            ws.run_forever()
-        except: pass
-        time.sleep(2)
+            ws.run_forever(ping_interval=PING_INTERVAL_S, ping_timeout=PING_TIMEOUT_S, sockopt=WS_SOCKOPT)
+        except (websocket.WebSocketException, OSError) as e:
+            print(f"⚠️ Exception: {e}")
+        # Back off while the ESP32 stays unreachable; on_open resets the delay
+        time.sleep(reconnect_delay)
+        reconnect_delay = min(reconnect_delay * 2, RECONNECT_MAX_S)
 
 threading.Thread(target=run_ws, daemon=True).start()
 root = tk.Tk()
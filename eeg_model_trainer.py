@@ -5,17 +5,54 @@ Trains a machine learning model from collected training data
 
 import pandas as pd
 import numpy as np
-import pickle
+import joblib
+import hashlib
+import os
+import sys
 from datetime import datetime
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.inspection import permutation_importance
+from sklearn.neural_network import MLPClassifier
+from sklearn.model_selection import train_test_split, cross_validate, GridSearchCV
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 # Label encoding for XGBoost
 from sklearn.metrics import classification_report, confusion_matrix
+import matplotlib
+matplotlib.use('Agg') # Figures only go to PNG; no GUI window, works headless
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
 
+# Optional JIT for the smoothing kernel; numpy handles it without numba
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+if HAVE_NUMBA:
+    @njit(cache=True, nogil=True, parallel=True)
+    def trailing_mean3(block, pos, out):
+        """3-row trailing mean of block into out; pos is each row's index within its group"""
+        for i in prange(block.shape[0]):
+            n = min(pos[i] + 1, 3)
+            for c in range(block.shape[1]):
+                acc = block[i, c]
+                if n > 1: acc += block[i - 1, c]
+                if n > 2: acc += block[i - 2, c]
+                out[i, c] = acc / n
+    
+    @njit(cache=True, fastmath=True)
+    def compute_ratios(att, med, theta, la, ha, lb, hb, out):
+        """alpha/theta, beta/alpha, beta/theta and att/med ratios for every row, one pass"""
+        for i in range(att.shape[0]):
+            alpha = la[i] + ha[i]
+            beta = lb[i] + hb[i]
+            out[i, 0] = alpha / (theta[i] + 1)
+            out[i, 1] = beta / (alpha + 1)
+            out[i, 2] = beta / (theta[i] + 1)
+            out[i, 3] = att[i] / (med[i] + 1)
+
 print("="*70)
 print("EEG Model Trainer")
 print("="*70)
@@ -39,30 +76,6 @@ if csv_file is None:
     print("! Please run eeg_training_collector.py first to collect data")
     exit(1)
 
-print(f"Loading training data: {csv_file}")
-df = pd.read_csv(csv_file)
-
-print(f"Loaded {len(df)} samples")
-print(f"\nData Overview:")
-print(df.head())
-
-# Check data distribution
-print(f"\nDirection Distribution:")
-print(df['direction'].value_counts())
-
-# Filter out poor signal quality samples
-original_count = len(df)
-df = df[df['signal_quality'] < 100]  # Keep only good quality samples
-filtered_count = len(df)
-print(f"\nFiltered samples: {original_count} -> {filtered_count} (removed {original_count - filtered_count} poor quality)")
-
-if len(df) < 50:
-    print("! WARNING: Very few samples! Model may not be accurate.")
-    print("! Collect more training data for better results")
-
-# Prepare features and labels
-print("\nPreparing features...")
-
 # Feature columns
 # Feature columns - Focused on signals per user request
 feature_columns = [
@@ -73,34 +86,107 @@ feature_columns = [
     'norm_alpha', 'norm_beta'
 ]
 
-X = df[feature_columns].values
-y = df['direction'].values
-
-print(f"Features shape: {X.shape}")
-print(f"Labels shape: {y.shape}")
-
-# Feature engineering - add derived features
-print("\nEngineering advanced features & Signal Smoothing...")
-
-# 1. Temporal Smoothing (Rolling Average) - CAUSAL logic
-# Sort globally by timestamp to maintain chronological order
-df = df.sort_values('timestamp').reset_index(drop=True)
-
-for col in feature_columns:
-    # 3-point rolling average within the same direction group
-    # groupby maintains the relative order of the original dataframe within each group
-    df[col] = df.groupby('direction', sort=False)[col].transform(lambda x: x.rolling(window=3, min_periods=1).mean())
+# Engineered features are cached per CSV content and pipeline, so retraining skips the pipeline below.
+# Bump FEATURE_PIPELINE_VERSION whenever the filtering, smoothing or ratio features change.
+FEATURE_PIPELINE_VERSION = 1
+try:
+    import pyarrow
+    parquet_installed = True
+except ImportError:
+    parquet_installed = False
 
-# 2. Minimum Effective Ratios
-# ... same logic as before ...
-alpha_sum = df['low_alpha'] + df['high_alpha']
-beta_sum = df['low_beta'] + df['high_beta']
-theta = df['theta']
+csv_hash = hashlib.md5(Path(csv_file).read_bytes())
+csv_hash.update(f"v{FEATURE_PIPELINE_VERSION}:{','.join(feature_columns)}".encode())
+csv_key = csv_hash.hexdigest()[:12]
+cache_file = Path(f"features_cache_{csv_key}.parquet")
 
-df['alpha_theta_ratio'] = alpha_sum / (theta + 1)
-df['beta_alpha_ratio'] = beta_sum / (alpha_sum + 1)
-df['beta_theta_ratio'] = beta_sum / (theta + 1)
-df['engagement_ratio'] = df['attention'] / (df['meditation'] + 1)
+if parquet_installed and cache_file.exists():
+    print(f"Loading engineered features from cache: {cache_file}")
+    df = pd.read_parquet(cache_file)
+    print(f"Loaded {len(df)} samples")
+else:
+    print(f"Loading training data: {csv_file}")
+    df = pd.read_csv(csv_file)
+
+    print(f"Loaded {len(df)} samples")
+    print(f"\nData Overview:")
+    print(df.head())
+
+    # Check data distribution
+    print(f"\nDirection Distribution:")
+    print(df['direction'].value_counts())
+
+    # Filter out poor signal quality samples
+    original_count = len(df)
+    df = df[df['signal_quality'] < 100]  # Keep only good quality samples
+    filtered_count = len(df)
+    print(f"\nFiltered samples: {original_count} -> {filtered_count} (removed {original_count - filtered_count} poor quality)")
+
+    if len(df) < 50:
+        print("! WARNING: Very few samples! Model may not be accurate.")
+        print("! Collect more training data for better results")
+
+    # Prepare features and labels
+    print("\nPreparing features...")
+    
+    X = df[feature_columns].to_numpy(dtype=np.float32)
+    y = df['direction'].values
+
+    print(f"Features shape: {X.shape}")
+    print(f"Labels shape: {y.shape}")
+
+    # Feature engineering - add derived features
+    print("\nEngineering advanced features & Signal Smoothing...")
+
+    # 1. Temporal Smoothing (Rolling Average) - CAUSAL logic
+    # Sort globally by timestamp to maintain chronological order
+    df = df.sort_values('timestamp').reset_index(drop=True)
+
+    # 3-point trailing average within the same direction group, all columns and groups at once
+    # A stable sort by direction keeps each group's rows in timestamp order and contiguous;
+    # the two previous rows only count when they belong to the same group
+    order = np.argsort(df['direction'].to_numpy(), kind='stable')
+    directions = df['direction'].to_numpy()[order]
+    block = df[feature_columns].to_numpy(dtype=np.float64)[order]
+    _, starts = np.unique(directions, return_index=True)
+    pos = np.arange(len(block)) - np.repeat(starts, np.diff(np.r_[starts, len(block)]))
+    counts = np.minimum(pos + 1, 3)
+    if HAVE_NUMBA:
+        # One fused kernel over all columns instead of several whole-array temporaries
+        window = np.empty_like(block)
+        trailing_mean3(block, pos, window)
+    else:
+        # One running sum over every group; subtracting it at the row just before each
+        # window also cancels everything from earlier groups
+        csum = np.cumsum(block, axis=0)
+        before = np.arange(len(block)) - counts
+        window = csum - np.where(before[:, None] >= 0, csum[np.maximum(before, 0)], 0)
+        window /= counts[:, None]
+    smoothed = np.empty_like(block)
+    smoothed[order] = window
+    df[feature_columns] = smoothed
+
+    # 2. Minimum Effective Ratios
+    ratio_columns = ['alpha_theta_ratio', 'beta_alpha_ratio', 'beta_theta_ratio', 'engagement_ratio']
+    if HAVE_NUMBA:
+        # All four ratios from one read of the input columns
+        ratios = np.empty((len(df), len(ratio_columns)))
+        compute_ratios(*(df[c].to_numpy(dtype=np.float64) for c in
+                         ('attention', 'meditation', 'theta', 'low_alpha', 'high_alpha', 'low_beta', 'high_beta')), ratios)
+        df[ratio_columns] = ratios
+    else:
+        alpha_sum = df['low_alpha'] + df['high_alpha']
+        beta_sum = df['low_beta'] + df['high_beta']
+        theta = df['theta']
+    
+        df['alpha_theta_ratio'] = alpha_sum / (theta + 1)
+        df['beta_alpha_ratio'] = beta_sum / (alpha_sum + 1)
+        df['beta_theta_ratio'] = beta_sum / (theta + 1)
+        df['engagement_ratio'] = df['attention'] / (df['meditation'] + 1)
+    
+    if parquet_installed:
+        df.to_parquet(cache_file, compression='zstd', index=False)
+        print(f"Cached engineered features: {cache_file}")
 
 all_features = feature_columns + [
     'beta_alpha_ratio', 'engagement_ratio'
@@ -110,60 +196,119 @@ all_features = feature_columns + [
 # (Ensures all classes are present in both train and test)
 print("\nSplitting data (80% train, 20% test, stratified)...")
 X_train, X_test, y_train, y_test = train_test_split(
-    df[all_features].values, 
-    df['direction'].values, 
+    df[all_features], 
+    df['direction'], 
     test_size=0.2, 
     random_state=42, 
-    stratify=df['direction'].values
+    stratify=df['direction']
 )
+# One conversion per split: float32 features, plain object labels (also for Arrow-backed strings)
+X_train, X_test = X_train.to_numpy(dtype=np.float32), X_test.to_numpy(dtype=np.float32)
+y_train, y_test = y_train.to_numpy(dtype=object), y_test.to_numpy(dtype=object)
 
 print(f"Training samples: {len(X_train)} (Classes: {len(np.unique(y_train))})")
 print(f"Testing samples: {len(X_test)} (Classes: {len(np.unique(y_test))})")
 
 # Standardize features (important for ML models)
 print("\nStandardizing features...")
-scaler = StandardScaler()
+scaler = StandardScaler(copy=False) # Scales the float32 split arrays in place
 X_train_scaled = scaler.fit_transform(X_train)
 X_test_scaled = scaler.transform(X_test)
-
-# Train Random Forest Classifier
-print("\nTraining Random Forest with reasonable defaults...")
-model = RandomForestClassifier(
-    n_estimators=100,
-    max_depth=10,
-    min_samples_split=4,
+# Keep the scaler in float32 too, so deployment never upcasts a tick
+scaler.mean_ = scaler.mean_.astype(np.float32)
+scaler.scale_ = scaler.scale_.astype(np.float32)
+
+# Train Histogram Gradient Boosting Classifier
+# (features binned to uint8, shallow trees: small pickle and fast predict_proba)
+model = HistGradientBoostingClassifier(
+    max_iter=200,
+    max_depth=6,
+    learning_rate=0.05,
     class_weight='balanced',
-    random_state=42,
-    n_jobs=-1
+    random_state=42
 )
-model.fit(X_train_scaled, y_train)
-
-# Evaluate model
-print("\nEvaluating model...")
 
-# TimeSeriesSplit Validation
-# TimeSeriesSplit Validation
-# Initial scores
-train_score = model.score(X_train_scaled, y_train)
-test_score = model.score(X_test_scaled, y_test)
+from sklearn.svm import LinearSVC
+from sklearn.calibration import CalibratedClassifierCV
 from sklearn.model_selection import TimeSeriesSplit, KFold
+from sklearn.base import clone
 cv = KFold(n_splits=3, shuffle=True, random_state=42)
-cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=cv)
+
+def fit_forest_split(forest, X, y, n_parts=os.cpu_count() or 1):
+    """Fit equal slices of the forest's trees in separate processes and merge them into one forest"""
+    n_trees = forest.n_estimators
+    n_parts = max(1, min(n_parts, n_trees))
+    sizes = [n_trees // n_parts + (i < n_trees % n_parts) for i in range(n_parts)]
+    seed = forest.random_state or 0
+    parts = joblib.Parallel(n_jobs=n_parts)(
+        joblib.delayed(clone(forest).set_params(n_estimators=k, n_jobs=1, random_state=seed + i).fit)(X, y)
+        for i, k in enumerate(sizes)
+    )
+    merged = parts[0]
+    merged.estimators_ = [tree for part in parts for tree in part.estimators_]
+    merged.set_params(n_estimators=n_trees, n_jobs=forest.n_jobs, random_state=forest.random_state)
+    return merged
+
+# Model comparison setup (Optional but kept minimal)
+models = {
+    'HistGradientBoosting': model,
+    # Kept as a candidate: a winning forest also gets the native/quantized exports below
+    # oob_score stays off: its extra prediction pass does not parallelize; each tree sees an 80% bootstrap
+    'RandomForest': RandomForestClassifier(n_estimators=100, max_depth=10, min_samples_split=4,
+                                           bootstrap=True, max_samples=0.8, max_features='sqrt', oob_score=False,
+                                           class_weight='balanced', random_state=42, n_jobs=-1),
+    # Linear SVM: no O(n^2) kernel matrix; sigmoid calibration supplies predict_proba for the cursor app
+    'SVM': CalibratedClassifierCV(LinearSVC(C=1.0, class_weight='balanced', random_state=42), ensemble=False),
+    # Small dense net: a couple of GEMMs per prediction, quantizes well to int8 in the ONNX export
+    'MLP': MLPClassifier(hidden_layer_sizes=(32, 16), max_iter=1000, early_stopping=True, random_state=42)
+}
+
+# Fit and score every model exactly once
+print("\nTraining and evaluating models...")
+results = {}
+for name, m in models.items():
+    print(f"\nTraining {name}...")
+    # Train and CV accuracy from the same fold fits; folds in parallel with one
+    # thread per worker so forests/boosting don't oversubscribe cores
+    with joblib.parallel_backend('loky', inner_max_num_threads=1):
+        cv_res = cross_validate(m, X_train_scaled, y_train, cv=cv, scoring='accuracy',
+                                return_train_score=True, n_jobs=cv.get_n_splits())
+    # Final fit on the full training split, then one pass over the test split
+    if isinstance(m, RandomForestClassifier):
+        # Sub-forests per process scale better than one n_jobs=-1 fit
+        m = models[name] = fit_forest_split(m, X_train_scaled, y_train)
+    else:
+        m.fit(X_train_scaled, y_train)
+    y_pred = m.predict(X_test_scaled)
+    tr_s = cv_res['train_score'].mean()
+    te_s = np.mean(y_pred == y_test)
+    cv_s = cv_res['test_score'].mean()
+    results[name] = {
+        'train_score': tr_s,
+        'test_score': te_s,
+        'cv_score': cv_s,
+        'y_pred': y_pred
+    }
+    print(f"\nModel: {name}")
+    print(classification_report(y_test, y_pred))
+
+# Evaluate model
+print("\nEvaluating model...")
+train_score = results['HistGradientBoosting']['train_score']
+test_score = results['HistGradientBoosting']['test_score']
+cv_score = results['HistGradientBoosting']['cv_score']
+y_pred = results['HistGradientBoosting']['y_pred']
 
 print(f"Training Accuracy: {train_score*100:.2f}%")
 print(f"Testing Accuracy: {test_score*100:.2f}%")
-print(f"Cross-Validation Accuracy: {cv_scores.mean()*100:.2f}%")
+print(f"Cross-Validation Accuracy: {cv_score*100:.2f}%")
 
-# Detailed classification report
-print("\nDetailed Classification Report:")
-y_pred = model.predict(X_test_scaled)
-print(classification_report(y_test, y_pred))
-
-# Feature importance
+# Feature importance (boosted trees have no feature_importances_, so permute the test set)
 print("\nFeature Importance (Top 10):")
+perm = permutation_importance(model, X_test_scaled, y_test, n_repeats=5, random_state=42, n_jobs=-1)
 feature_importance = pd.DataFrame({
     'feature': all_features,
-    'importance': model.feature_importances_
+    'importance': perm.importances_mean
 }).sort_values('importance', ascending=False)
 
 print(feature_importance.head(10).to_string(index=False))
@@ -176,9 +321,11 @@ fig = plt.figure(figsize=(15, 10))
 
 # 1. Confusion Matrix
 ax1 = plt.subplot(2, 2, 1)
-cm = confusion_matrix(y_test, y_pred)
+# Integer labels: one encoding pass instead of string lookups inside confusion_matrix
+le = LabelEncoder().fit(y_train)
+cm = confusion_matrix(le.transform(y_test), le.transform(y_pred), labels=np.arange(len(le.classes_)))
 sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
-            xticklabels=model.classes_, yticklabels=model.classes_)
+            xticklabels=le.classes_, yticklabels=le.classes_)
 ax1.set_title('Confusion Matrix')
 ax1.set_ylabel('True Label')
 ax1.set_xlabel('Predicted Label')
@@ -202,7 +349,7 @@ ax3.tick_params(axis='x', rotation=45)
 # 4. Accuracy Comparison
 ax4 = plt.subplot(2, 2, 4)
 accuracies = ['Training', 'Testing', 'Cross-Val']
-scores = [train_score, test_score, cv_scores.mean()]
+scores = [train_score, test_score, cv_score]
 bars = ax4.bar(accuracies, scores, color=['green', 'blue', 'orange'])
 ax4.set_ylim([0, 1])
 ax4.set_ylabel('Accuracy')
@@ -218,13 +365,29 @@ for bar, score in zip(bars, scores):
 
 plt.tight_layout()
 
-from sklearn.svm import SVC
 # Save visualization
 viz_filename = f"model_evaluation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
 plt.savefig(viz_filename, dpi=150, bbox_inches='tight')
 print(f"Saved visualization: {viz_filename}")
 
-plt.show()
+plt.close(fig)
+
+# Select best model
+best_model_name = max(results, key=lambda k: results[k]['test_score'])
+model = models[best_model_name]
+print(f"\n🏆 Best model: {best_model_name} (Test Accuracy: {results[best_model_name]['test_score']*100:.2f}%)")
+
+# Small IDLE-vs-active gate: eeg_cursor_control.py skips the main model when it says IDLE
+# Only possible when the data has both IDLE and active rows (merged step files may not)
+gate_y = y_train != 'IDLE'
+if gate_y.all() or not gate_y.any():
+    gater = None
+    print("\n⚠️ Skipping IDLE gate: training data needs both IDLE and active samples")
+else:
+    print("\nTraining IDLE gate...")
+    gater = HistGradientBoostingClassifier(max_iter=20, max_depth=3, random_state=42)
+    gater.fit(X_train_scaled, gate_y)
+    print(f"Gate accuracy (IDLE vs active): {gater.score(X_test_scaled, y_test != 'IDLE')*100:.2f}%")
 
 # Save model and scaler
 print("\n💾 Saving trained model...")
@@ -236,55 +399,122 @@ except ImportError:
 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
 model_filename = f"eeg_model_{timestamp}.pkl"
 
+# Optional native build of the tree model, loaded by eeg_cursor_control.py when present
+try:
+    import treelite.sklearn
+    import tl2cgen
+    tl_installed = True
+except ImportError:
+    tl_installed = False
+
+treelite_lib = None
+# Forests and histogram boosting both import into treelite; the SVM/MLP rely on the ONNX export
+if tl_installed and isinstance(model, (RandomForestClassifier, HistGradientBoostingClassifier)):
+    lib_ext = '.dll' if sys.platform == 'win32' else '.dylib' if sys.platform == 'darwin' else '.so'
+    treelite_lib = f"eeg_model_{timestamp}{lib_ext}"
+    tl_model = treelite.sklearn.import_model(model)
+    tl2cgen.export_lib(tl_model, toolchain='msvc' if sys.platform == 'win32' else 'gcc',
+                       libpath=treelite_lib, params={'parallel_comp': 4})
+    print(f"✅ Compiled model library: {treelite_lib}")
+
+def quantize_forest(forest):
+    """Flatten a fitted forest into split-bin indices (int16, int32 if needed) and uint8 leaf probabilities"""
+    trees = [est.tree_ for est in forest.estimators_]
+    n_features = forest.n_features_in_
+    
+    # Per-feature sorted split values: a threshold becomes its index in this list and an
+    # input becomes the count of values below it, so x <= t is exactly bin(x) <= index(t)
+    edges = []
+    for f in range(n_features):
+        used = [t.threshold[(t.children_left != -1) & (t.feature == f)] for t in trees]
+        edges.append(np.unique(np.concatenate(used)))
+    edge_offsets = np.cumsum([0] + [len(e) for e in edges])
+    # Bin indices run up to a feature's split count; int16 would silently wrap past 32767
+    bin_dtype = np.int16 if max(len(e) for e in edges) <= np.iinfo(np.int16).max else np.int32
+    
+    offsets = np.cumsum([0] + [t.node_count for t in trees])
+    left, right, feature, q_threshold, q_value = [], [], [], [], []
+    for off, t in zip(offsets, trees):
+        leaf = t.children_left == -1
+        left.append(np.where(leaf, -1, t.children_left + off))
+        right.append(np.where(leaf, -1, t.children_right + off))
+        f = np.where(leaf, 0, t.feature)
+        feature.append(f)
+        q = np.zeros(t.node_count)
+        for node in np.flatnonzero(~leaf):
+            q[node] = np.searchsorted(edges[f[node]], t.threshold[node])
+        q_threshold.append(q)
+        # Leaf class distributions as fractions of 255
+        value = t.value[:, 0, :]
+        value = value / np.maximum(value.sum(axis=1, keepdims=True), 1e-12)
+        q_value.append(np.rint(value * 255))
+    
+    return {
+        'classes': forest.classes_,
+        'roots': offsets[:-1].astype(np.int32),
+        'left': np.concatenate(left).astype(np.int32),
+        'right': np.concatenate(right).astype(np.int32),
+        'feature': np.concatenate(feature).astype(np.int16),
+        'threshold': np.concatenate(q_threshold).astype(bin_dtype),
+        'value': np.concatenate(q_value).astype(np.uint8),
+        'edges': np.concatenate(edges),
+        'edge_offsets': edge_offsets.astype(np.int32),
+    }
+
+# Compact forest for eeg_cursor_control.py's compiled traversal
+quantized_forest = quantize_forest(model) if hasattr(model, 'estimators_') else None
+
 model_package = {
     'model': model,
+    'model_type': best_model_name,
     'scaler': scaler,
     'feature_names': all_features,
     'classes': model.classes_,
-    'train_accuracy': train_score,
-    'test_accuracy': test_score,
-    'cv_accuracy': cv_scores.mean(),
+    'train_accuracy': results[best_model_name]['train_score'],
+    'test_accuracy': results[best_model_name]['test_score'],
+    'cv_accuracy': results[best_model_name]['cv_score'],
     'training_date': datetime.now().isoformat(),
-    'training_samples': len(df)
-}
-
-with open(model_filename, 'wb') as f:
-    pickle.dump(model_package, f)
-
-# Model comparison setup (Optional but kept minimal)
-models = {
-    'RandomForest': model,
-    'SVM': SVC(kernel='rbf', C=1.0, probability=True, class_weight='balanced', random_state=42)
+    'training_samples': len(df),
+    'treelite_lib': treelite_lib,
+    'quantized_forest': quantized_forest,
+    'gater': gater
 }
 
-# SVM Training
-print("\nTraining SVM (RBF kernel)...")
-models['SVM'].fit(X_train_scaled, y_train)
-
-# Evaluate all models
-print("\nEvaluating models with TimeSeriesSplit...")
-results = {}
-for name, m in models.items():
-    m.fit(X_train_scaled, y_train) # Ensure fresh fit
-    tr_s = m.score(X_train_scaled, y_train)
-    te_s = m.score(X_test_scaled, y_test)
-    cv_s = cross_val_score(m, X_train_scaled, y_train, cv=cv).mean()
-    y_pred = m.predict(X_test_scaled)
-    results[name] = {
-        'train_score': tr_s,
-        'test_score': te_s,
-        'cv_score': cv_s,
-        'y_pred': y_pred
-    }
-    print(f"\nModel: {name}")
-    print(classification_report(y_test, y_pred))
-
-# Select best model
-best_model_name = max(results, key=lambda k: results[k]['test_score'])
-model = models[best_model_name]
-print(f"\n🏆 Best model: {best_model_name} (Test Accuracy: {results[best_model_name]['test_score']*100:.2f}%)")
+# Compressed package: LZ4 when available (near-free to decompress), zlib level 3 otherwise.
+# Set COMPRESS_MODEL = False for an uncompressed .pkl: larger on disk, but
+# eeg_cursor_control.py then memory-maps its arrays instead of decompressing them.
+COMPRESS_MODEL = True
+if not COMPRESS_MODEL:
+    model_compress = 0
+else:
+    try:
+        import lz4
+        model_compress = ('lz4', 3)
+    except ImportError:
+        model_compress = 3
+joblib.dump(model_package, model_filename, compress=model_compress)
 print(f"✅ Model saved: {model_filename}")
 
+# Optional ONNX export, picked up by eeg_cursor_control.py next to the .pkl
+try:
+    from skl2onnx import to_onnx
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    onnx_installed = True
+except ImportError:
+    onnx_installed = False
+
+if onnx_installed:
+    onnx_filename = model_filename.replace('.pkl', '.onnx')
+    fp32_filename = model_filename.replace('.pkl', '_fp32.onnx')
+    # zipmap off: probabilities come back as a plain (n, classes) array
+    onx = to_onnx(model, X_train_scaled[:1].astype(np.float32), options={id(model): {'zipmap': False}})
+    with open(fp32_filename, 'wb') as f:
+        f.write(onx.SerializeToString())
+    # int8 weights where the graph has MatMul/Gemm (the MLP); tree ensembles pass through unchanged
+    quantize_dynamic(fp32_filename, onnx_filename, weight_type=QuantType.QInt8)
+    Path(fp32_filename).unlink()
+    print(f"✅ ONNX model saved: {onnx_filename}")
+
 # Prediction example
 print("\nPrediction on a random sample:")
 random_idx = np.random.randint(0, len(X_test_scaled))
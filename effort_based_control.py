@@ -20,12 +20,21 @@ Click: ❌ REMOVED (intentionally)
 
 import websocket
 import json
+import math
+import queue
 import time
 import threading
-from collections import deque
 import tkinter as tk
 from tkinter import ttk
 import pyautogui
+import numpy as np
+
+# Optional JIT for the per-tick numeric core; runs as plain Python without numba
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        return lambda f: f
 
 # ================= CONFIG =================
 ESP32_IP = "NeuroCursor-esp.local"
@@ -45,6 +54,10 @@ MOVEMENT_FACTOR = 0.5
 POLLING_INTERVAL = 0.1  # Faster for smoother proportional move
 
 MOVE_COOLDOWN = 0.05  # Lowered for proportional smoothness
+MOVE_STATES = {
+    True: {"text": "PUSH LEFT", "fg": "#3498db"},
+    False: {"text": "PULL RIGHT", "fg": "#e74c3c"},
+}
 
 # ================= EMA STATE =================
 avg_att = 0.0
@@ -58,21 +71,43 @@ sens_right = 5.0  # Default Gain
 last_move_time = 0
 fail_safe_paused = False
 
-current_data = {
-    "sig": 200,
-    "att": 0,
-    "med": 0,
-    "la": 0,
-    "ha": 0,
-    "lb": 0,
-    "hb": 0
-}
+# Recent packets, one row per packet and one column per key (index with KIDX).
+# on_message fills the next row and only then bumps packet_count, so the newest
+# row is always complete and the UI loop never needs a lock.
+DATA_KEYS = ("sig", "att", "med", "la", "ha", "lb", "hb")
+KIDX = {k: i for i, k in enumerate(DATA_KEYS)}
+PACKET_RING = 128
+packet_buf = np.zeros((PACKET_RING, len(DATA_KEYS)), dtype=np.float32)
+packet_buf[0, KIDX["sig"]] = 200
+packet_count = 1
+
+def latest_packet():
+    """View of the newest complete packet row"""
+    return packet_buf[(packet_count - 1) % PACKET_RING]
 
-data_lock = threading.Lock()
 ws_connected = False
 
-att_history = deque(maxlen=5)
-alpha_history = deque(maxlen=5)
+prev_alpha = 0.0 # Alpha seen on the previous tick
+
+@njit(cache=True)
+def tick_stats(att, med, la, ha, lb, hb, prev_alpha, avg_att, avg_med):
+    """Ratios and EMA update for one tick: (alpha, beta_ratio, alpha_change_pct, avg_att, avg_med)"""
+    alpha = la + ha
+    beta_ratio = hb / (lb + 1)
+    alpha_change_pct = alpha / prev_alpha if prev_alpha > 0 else 1.0
+    avg_att = (EMA_ALPHA * att) + ((1 - EMA_ALPHA) * avg_att)
+    avg_med = (EMA_ALPHA * med) + ((1 - EMA_ALPHA) * avg_med)
+    return alpha, beta_ratio, alpha_change_pct, avg_att, avg_med
+
+@njit(cache=True)
+def drive_levels(avg_att, baseline_att, l_sens, r_sens):
+    """LEFT/RIGHT drive (0-100) from focus relative to baseline, deadzone 5"""
+    diff = avg_att - baseline_att
+    # PUSH LEFT (Focus higher)
+    l_drive = max(0.0, min(100.0, (diff - 5) * l_sens))
+    # PULL RIGHT (Focus lower)
+    r_drive = max(0.0, min(100.0, ((-diff) - 5) * r_sens))
+    return l_drive, r_drive
 
 # ================= GUI APP (NeuroGlide) =================
 class EffortControlApp:
@@ -199,6 +234,10 @@ class EffortControlApp:
 
         self.log("NEURAL LINK: STANDBY. Press [SPACE] to Center.")
         self.root.bind("<space>", lambda e: self.center_mouse())
+
+        # Mouse injection runs on its own thread; one pending move at most, newer ones are dropped
+        self.move_q = queue.Queue(maxsize=1)
+        threading.Thread(target=self.move_worker, daemon=True).start()
         self.update_loop()
 
     def make_gauge(self, parent, name, row, color):
@@ -229,6 +268,24 @@ class EffortControlApp:
         self.log_box.insert(tk.END, f"> {msg}\n")
         self.log_box.see(tk.END)
 
+    def move_worker(self):
+        """Apply queued moves off the Tk thread; a fail-safe hit is handed back to the UI"""
+        global fail_safe_paused
+        pyautogui.PAUSE = 0 # No built-in sleep after each call
+        while True:
+            dx = self.move_q.get()
+            if fail_safe_paused: continue
+            try:
+                pyautogui.move(dx, 0)
+            except pyautogui.FailSafeException:
+                fail_safe_paused = True
+                self.root.after(0, self.engage_fail_safe)
+
+    def engage_fail_safe(self):
+        self.log("⚠️ SAFETY LOCK ENGAGED")
+        self.active = False
+        self.toggle_btn.config(text="ACTIVATE SYSTEM", bg="#38a169")
+
     def toggle_active(self):
         self.active = not self.active
         if self.active:
@@ -239,7 +296,7 @@ class EffortControlApp:
             self.log("NEURAL LINK: STANDBY")
 
     def update_loop(self):
-        global last_move_time, fail_safe_paused, avg_att, avg_med, baseline_att
+        global last_move_time, fail_safe_paused, avg_att, avg_med, baseline_att, prev_alpha
 
         if fail_safe_paused:
             self.state_label.config(text="SYSTEM LOCK", fg="#e53e3e")
@@ -253,23 +310,11 @@ class EffortControlApp:
             self.root.after(500, self.update_loop)
             return
 
-        with data_lock:
-            att = current_data["att"]
-            med = current_data["med"]
-            la, ha = current_data["la"], current_data["ha"]
-            lb, hb = current_data["lb"], current_data["hb"]
-            sig = current_data["sig"]
+        sig, att, med, la, ha, lb, hb = latest_packet().tolist()
 
-        alpha = la + ha
-        beta_ratio = hb / (lb + 1)
-
-        att_history.append(att)
-        alpha_history.append(alpha)
-
-        if len(alpha_history) >= 2 and alpha_history[-2] > 0:
-            alpha_change_pct = alpha / alpha_history[-2]
-        else:
-            alpha_change_pct = 1.0
+        alpha, beta_ratio, alpha_change_pct, avg_att, avg_med = tick_stats(
+            att, med, la, ha, lb, hb, prev_alpha, avg_att, avg_med)
+        prev_alpha = alpha
 
         self.att_bar["value"] = att
         self.med_bar["value"] = med
@@ -280,13 +325,10 @@ class EffortControlApp:
             fg="#27ae60" if ws_connected else "#e74c3c"
         )
 
-        # --- EMA SMOOTHING ---
-        avg_att = (EMA_ALPHA * att) + ((1 - EMA_ALPHA) * avg_att)
-        avg_med = (EMA_ALPHA * med) + ((1 - EMA_ALPHA) * avg_med)
-
+        # --- EMA SMOOTHING (updated in tick_stats) ---
         self.att_bar["value"] = avg_att
         self.med_bar["value"] = avg_med
-        self.beta_label.config(text=f"Raw Att: {att} | Avg Att: {int(avg_att)}")
+        self.beta_label.config(text=f"Raw Att: {int(att)} | Avg Att: {int(avg_att)}")
 
         # ===== CONTROL LOGIC (ULTRA-SENSITIVE DYNAMIC PIVOT) =====
         if self.active and ws_connected and sig <= 50:
@@ -296,54 +338,46 @@ class EffortControlApp:
             r_sens = self.s_right.get()
 
             # Movement Threshold (Deadzone = 5)
-            diff = avg_att - baseline_att
-            
-            # PUSH LEFT (Focus higher)
-            l_drive = max(0, min(100, (diff - 5) * l_sens)) 
-            
-            # PULL RIGHT (Focus lower)
             # We use r_sens to make the "Relaxation" trigger much easier
-            r_drive = max(0, min(100, ((-diff) - 5) * r_sens))
+            l_drive, r_drive = drive_levels(avg_att, baseline_att, l_sens, r_sens)
             
             self.l_energy['value'] = l_drive
             self.r_energy['value'] = r_drive
 
             now = time.time()
             if now - last_move_time > MOVE_COOLDOWN:
-                try:
-                    # LEFT
-                    if l_drive > 5:
-                        speed = MOVEMENT_SPEED_BASE + (l_drive / 8)
-                        pyautogui.move(int(-speed), 0)
-                        last_move_time = now
-                        self.state_label.config(text="PUSH LEFT", fg="#3498db")
-                    
-                    # RIGHT
-                    elif r_drive > 5:
-                        speed = MOVEMENT_SPEED_BASE + (r_drive / 8)
-                        pyautogui.move(int(speed), 0)
-                        last_move_time = now
-                        self.state_label.config(text="PULL RIGHT", fg="#e74c3c")
-                    
-                    else:
-                        self.state_label.config(text=f"NEUTRAL (Center: {int(baseline_att)})", fg="#bdc3c7")
-                        
-                except pyautogui.FailSafeException:
-                    fail_safe_paused = True
-                    self.log("⚠️ SAFETY LOCK ENGAGED")
-                    self.active = False
-                    self.toggle_btn.config(text="ACTIVATE SYSTEM", bg="#38a169")
+                # At most one side is driven: > 0 pushes LEFT, < 0 pulls RIGHT
+                drive = l_drive - r_drive
+                if abs(drive) > 5:
+                    dx = -math.copysign(MOVEMENT_SPEED_BASE + abs(drive) / 8, drive)
+                    try:
+                        self.move_q.put_nowait(int(dx))
+                    except queue.Full:
+                        pass # Worker still busy with the previous move
+                    last_move_time = now
+                    self.state_label.config(**MOVE_STATES[drive > 0])
+                else:
+                    self.state_label.config(text=f"NEUTRAL (Center: {int(baseline_att)})", fg="#bdc3c7")
 
         self.root.after(int(POLLING_INTERVAL * 1000), self.update_loop)
 
 
 # ================= WEBSOCKET =================
 def on_message(ws, message):
+    global packet_count
     try:
         data = json.loads(message)
-        with data_lock:
-            current_data.update(data)
-    except:
+        n = packet_count
+        row = packet_buf[n % PACKET_RING]
+        # Keys missing from a packet keep their previous value
+        row[:] = packet_buf[(n - 1) % PACKET_RING]
+        for k, v in data.items():
+            i = KIDX.get(k)
+            if i is not None: row[i] = v
+        # Publish only once the row is complete
+        packet_count = n + 1
+    except (ValueError, TypeError, AttributeError):
+        # Malformed packet; drop it
         pass
 
 def on_open(ws):
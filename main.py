@@ -1,12 +1,25 @@
 import socket
+import struct
 import pyautogui
 import time
 
+# Optional JIT for the per-sample decision; runs as plain Python without numba
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        return lambda f: f
+
 # ============== Configuration ==============
 ESP_IP = "http://10.131.191.211"  # Update this with your ESP32 IP from Serial Monitor
 PORT = 3333
 STEP = 20  # Pixels to move per action
 
+# Wire format: text lines "att,med,raw\n", or packed frames when the ESP32 sends binary
+BINARY_FRAMES = False
+FRAME_PREAMBLE = b"\xAA\x55"
+FRAME = struct.Struct("<2siii")  # preamble, attention, meditation, raw (little-endian int32)
+
 # Thresholds for mouse control
 ATTENTION_HIGH = 70    # Move UP when attention > this
 ATTENTION_LOW = 30     # Move LEFT when attention < this
@@ -16,7 +29,9 @@ BLINK_THRESHOLD = 1500 # Click when |raw| > this
 
 # Safety: prevent mouse from moving to corners (PyAutoGUI failsafe)
 pyautogui.FAILSAFE = True
-pyautogui.PAUSE = 0.01  # Small delay between actions
+pyautogui.PAUSE = 0  # Pacing is done in process_brainwave_data instead
+ACTION_GAP_S = 0.01  # Minimum time between mouse actions
+last_action_time = 0.0
 
 def connect_to_esp32():
     """Connect to ESP32 TCP server"""
@@ -50,38 +65,63 @@ def connect_to_esp32():
         print("   3. Both devices are on the same network")
         return None
 
+@njit(cache=True)
+def decide(att, med, raw, step, att_hi, att_lo, med_hi, med_lo, blink):
+    """Mouse action for one sample as (dx, dy, click)"""
+    dx = 0
+    dy = 0
+    # Vertical movement (UP/DOWN)
+    if att > att_hi:
+        dy = -step
+    elif med > med_hi:
+        dy = step
+    # Horizontal movement (LEFT/RIGHT)
+    if att < att_lo:
+        dx = -step
+    elif med < med_lo:
+        dx = step
+    # Click on blink/spike
+    return dx, dy, abs(raw) > blink
+
 def process_brainwave_data(attention, meditation, raw):
     """Process brainwave data and control mouse"""
-    moved = False
-    action = ""
+    global last_action_time
+    dx, dy, click = decide(attention, meditation, raw, STEP, ATTENTION_HIGH, ATTENTION_LOW,
+                           MEDITATION_HIGH, MEDITATION_LOW, BLINK_THRESHOLD)
+    if not (dx or dy or click):
+        return None
     
-    # Vertical movement (UP/DOWN)
-    if attention > ATTENTION_HIGH:
-        pyautogui.move(0, -STEP)
-        action = "⬆️ UP"
-        moved = True
-    elif meditation > MEDITATION_HIGH:
-        pyautogui.move(0, STEP)
-        action = "⬇️ DOWN"
-        moved = True
+    # Only wait when the previous action was less than ACTION_GAP_S ago
+    wait = last_action_time + ACTION_GAP_S - time.perf_counter()
+    if wait > 0:
+        time.sleep(wait)
+    if dx or dy:
+        pyautogui.move(dx, dy)
+    if click:
+        pyautogui.click()
+    last_action_time = time.perf_counter()
     
-    # Horizontal movement (LEFT/RIGHT)
-    if attention < ATTENTION_LOW:
-        pyautogui.move(-STEP, 0)
-        action = "⬅️ LEFT" if not action else action + " + ⬅️ LEFT"
-        moved = True
-    elif meditation < MEDITATION_LOW:
-        pyautogui.move(STEP, 0)
-        action = "➡️ RIGHT" if not action else action + " + ➡️ RIGHT"
-        moved = True
+    actions = []
+    if dy:
+        actions.append("⬆️ UP" if dy < 0 else "⬇️ DOWN")
+    if dx:
+        actions.append("⬅️ LEFT" if dx < 0 else "➡️ RIGHT")
+    if click:
+        actions.append("🖱️ CLICK")
+    return " + ".join(actions)
+
+def report_sample(attention, meditation, raw):
+    """Act on one sample and print it"""
+    action = process_brainwave_data(attention, meditation, raw)
     
-    # Click on blink/spike
-    if abs(raw) > BLINK_THRESHOLD:
-        pyautogui.click()
-        action = "🖱️ CLICK" if not action else action + " + 🖱️ CLICK"
-        moved = True
+    # Display ALL real-time data
+    timestamp = time.strftime("%H:%M:%S")
+    status = f"ATT: {attention:3d} | MED: {meditation:3d} | RAW: {raw:6d}"
     
-    return action if moved else None
+    if action:
+        print(f"[{timestamp}] 📡 {status} → {action}")
+    else:
+        print(f"[{timestamp}] 📡 {status}")
 
 def main():
     sock = connect_to_esp32()
@@ -89,7 +129,7 @@ def main():
         return
     
     sock.settimeout(2.0)
-    buffer = ""
+    buffer = bytearray()  # Raw bytes; lines/frames are cut straight out of it
     last_data_time = time.time()
     
     print("\n🔴 LIVE DATA STREAM:")
@@ -98,7 +138,7 @@ def main():
     try:
         while True:
             try:
-                data = sock.recv(256).decode(errors="ignore")
+                data = sock.recv(256)
                 if not data:
                     print("❌ Connection lost!")
                     break
@@ -115,38 +155,44 @@ def main():
                 print(f"❌ Receive error: {e}")
                 break
             
+            if BINARY_FRAMES:
+                buffer += data
+                while len(buffer) >= FRAME.size:
+                    if buffer[:2] != FRAME_PREAMBLE:
+                        # Out of sync: skip to the next preamble (keep a possible split one)
+                        i = buffer.find(FRAME_PREAMBLE, 1)
+                        del buffer[:i if i > 0 else len(buffer) - 1]
+                        continue
+                    _, attention, meditation, raw = FRAME.unpack_from(buffer)
+                    del buffer[:FRAME.size]
+                    report_sample(attention, meditation, raw)
+                    last_data_time = time.time()
+                continue
+            
             buffer += data
             
-            while "\n" in buffer:
-                line, buffer = buffer.split("\n", 1)
-                line = line.strip()
+            # int() parses ASCII bytes directly, so lines are never decoded to str
+            while (nl := buffer.find(b"\n")) != -1:
+                line = bytes(buffer[:nl]).strip()
+                del buffer[:nl + 1]
                 if not line:
                     continue
                 
                 try:
-                    parts = line.split(",")
+                    parts = line.split(b",")
                     if len(parts) >= 3:
                         attention = int(parts[0])
                         meditation = int(parts[1])
                         raw = int(parts[2])
                         
                         # Process and move mouse
-                        action = process_brainwave_data(attention, meditation, raw)
+                        report_sample(attention, meditation, raw)
                         
                         # Update last data time
                         last_data_time = time.time()
-                        
-                        # Display ALL real-time data
-                        timestamp = time.strftime("%H:%M:%S")
-                        status = f"ATT: {attention:3d} | MED: {meditation:3d} | RAW: {raw:6d}"
-                        
-                        if action:
-                            print(f"[{timestamp}] 📡 {status} → {action}")
-                        else:
-                            print(f"[{timestamp}] 📡 {status}")
                                 
                 except ValueError as e:
-                    print(f"⚠️ Parse error: {line} - {e}")
+                    print(f"⚠️ Parse error: {line.decode(errors='ignore')} - {e}")
                     continue
                     
     except KeyboardInterrupt:
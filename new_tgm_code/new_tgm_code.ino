@@ -34,6 +34,13 @@ HardwareSerial TGAMSerial(1);
 #define TGAM_TX_PIN 17  // Not used
 #define TGAM_BAUD_RATE 9600  // Use 9600 for processed data
 
+/* ================= OUTPUT FORMAT ================= */
+// 1 = broadcast packed binary frames instead of JSON text:
+//     int16 sig, att, med, raw + uint32 delta..midGamma, little-endian (40 bytes).
+// Only eeg.py, eeg_cursor_control.py and train_data_collect.py decode binary frames;
+// keep 0 for the other host scripts.
+#define BINARY_FRAMES 0
+
 /* ================= PACKET CONSTANTS ================= */
 #define SYNC_BYTE 0xAA
 #define EXCODE 0x55
@@ -355,6 +362,18 @@ unsigned long read3ByteValue(int index) {
 void sendDataToWebSocket() {
   if (!clientConnected) return;
   
+#if BINARY_FRAMES
+  struct __attribute__((packed)) {
+    int16_t sig, att, med, raw;
+    uint32_t bands[8];
+  } frame = {
+    (int16_t)poorSignalQuality, (int16_t)attention, (int16_t)meditation, (int16_t)rawValue,
+    {delta, theta, lowAlpha, highAlpha, lowBeta, highBeta, lowGamma, midGamma}
+  };
+  webSocket.broadcastBIN((uint8_t*)&frame, sizeof(frame));
+  return;
+#endif
+  
   // Build JSON string
   String json = "{";
   json += "\"sig\":" + String(poorSignalQuality) + ",";
@@ -12,20 +12,61 @@ Signal Mapping:
 
 import websocket
 import json
-import csv
+import socket
+import struct
 import time
 import threading
 import random
+from collections import namedtuple
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox
 import glob
 import os
+import numpy as np
+import pandas as pd
+
+# Optional faster JSON decoder for the per-message hot path
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Optional pre-rendered arrow images; the arrow is drawn as a text glyph without Pillow
+try:
+    from PIL import Image, ImageDraw, ImageTk
+except ImportError:
+    ImageTk = None
+
+# Optional asyncio WebSocket client; websocket-client is used without it
+try:
+    import asyncio
+    import websockets
+    # Reconnecting via `async for ... in connect()` needs websockets 10+
+    if int(websockets.__version__.split(".")[0]) < 10:
+        websockets = None
+except ImportError:
+    websockets = None
 
 # Configuration
 ESP32_IP = "NeuroCursor-esp.local"  # ⚠️ CHANGE THIS
 WS_PORT = 81
 WS_URL = f"ws://{ESP32_IP}:{WS_PORT}"
+# Send small frames immediately instead of waiting on Nagle's algorithm,
+# and give the kernel room to queue frames while the GUI is busy
+WS_SOCKOPT = (
+    (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+    (socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20),
+)
+RECONNECT_S = 5     # Delay before reconnecting after a drop
+PING_INTERVAL_S = 10 # Keepalive so a half-open connection is noticed
+PING_TIMEOUT_S = 5
+
+# Binary frame sent when the firmware is built with BINARY_FRAMES=1:
+# sig, att, med, raw as int16 followed by the 8 band powers as uint32 (little-endian),
+# i.e. exactly EEGSample field order
+BINARY_FRAME = struct.Struct("<4h8I")
 
 # Training configuration - Updated for signal-specific collection
 DIRECTIONS = ["LEFT", "RIGHT", "UP", "DOWN", "IDLE"]
@@ -37,30 +78,111 @@ SIGNAL_MAPPING = {
     "IDLE": "Baseline"
 }
 SAMPLES_PER_DIRECTION = 60
+ARROW_COLORS = {
+    "LEFT": "#3498db",
+    "RIGHT": "#e74c3c",
+    "UP": "#2ecc71",
+    "DOWN": "#f39c12",
+    "IDLE": "#95a5a6"
+}
+ARROW_SIZE = 110  # pixels, about the height of the 50pt glyph it replaces
 DISPLAY_TIME = 5  # seconds to show each arrow
+COLLECTION_INTERVAL_MS = 200  # at most one sample per 200ms while an arrow is shown
 REST_TIME = 0     # Removed rest between trials per user request
 
-# Current EEG data (latest)
-current_data = {
-    "sig": 200, "att": 0, "med": 0, "raw": 0,
-    "delta": 0, "theta": 0, "la": 0, "ha": 0,
-    "lb": 0, "hb": 0, "lg": 0, "mg": 0
+# Recorded samples are kept in one structured array (one column per CSV field).
+# Timestamps are integer nanoseconds since the epoch (time.time_ns()); the CSV
+# gets them as seconds, the same unit as every other training CSV.
+DIRECTION_CODES = {d: i for i, d in enumerate(DIRECTIONS)}
+# Raw signals fit float32 exactly; the norm_* columns need float64, since summed
+# band powers pass 2**24 and the baseline means they subtract are fractional.
+SAMPLE_DTYPE = np.dtype([("timestamp", "i8"), ("direction", "u1")] + [
+    (name, "f4") for name in (
+        "signal_quality", "attention", "meditation", "raw", "delta", "theta",
+        "low_alpha", "high_alpha", "low_beta", "high_beta", "low_gamma", "mid_gamma")
+] + [(name, "f8") for name in ("norm_att", "norm_med", "norm_alpha", "norm_beta")])
+# CSV layout for those rows, built once: %.9g round-trips the float32 columns exactly
+# (whole numbers such as 24-bit band powers stay plain integers); the float64 norm_*
+# columns are written to 15 significant digits
+CSV_HEADER = (",".join(SAMPLE_DTYPE.names) + "\n").encode("ascii")
+CSV_ROW_FORMAT = b"%d.%06d,%s," + b",".join(
+    b"%.9g" if SAMPLE_DTYPE[name] == np.float32 else b"%.15g" for name in SAMPLE_DTYPE.names[2:]
+) + b"\n"
+DIRECTION_BYTES = [d.encode("ascii") for d in DIRECTIONS]
+
+# Current EEG data (latest), published as an immutable snapshot.
+# The WebSocket thread swaps _snapshot[0] in one assignment (atomic under the GIL),
+# so readers just take _snapshot[0] without locking.
+# Fields are in the order of the signal_quality..mid_gamma CSV columns.
+EEGSample = namedtuple("EEGSample", [
+    "sig", "att", "med", "raw",
+    "delta", "theta", "la", "ha",
+    "lb", "hb", "lg", "mg"
+])
+_snapshot = [EEGSample(200, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)]
+
+# Decoder specialised to the fixed ESP32 schema: one unrolled .get per field,
+# keys missing from a packet keep their previous value
+_body = [f"        d.get({k!r}, prev[{i}])," for i, k in enumerate(EEGSample._fields)]
+_ns = {"json_loads": json_loads, "EEGSample": EEGSample}
+exec("def decode_frame(message, prev):\n    d = json_loads(message)\n    return EEGSample(\n" + "\n".join(_body) + "\n    )", _ns)
+decode_frame = _ns["decode_frame"]
+
+def render_arrow(direction, size=ARROW_SIZE, bg="#2c3e50"):
+    """Draw one direction's arrow (a ring for IDLE) as a PIL image"""
+    img = Image.new("RGB", (size, size), bg)
+    draw = ImageDraw.Draw(img)
+    s = size / 100
+    if direction == "IDLE":
+        draw.ellipse([22 * s, 22 * s, 78 * s, 78 * s], outline=ARROW_COLORS[direction], width=round(8 * s))
+        return img
+    # Right-pointing arrow on a 100x100 grid, mirrored/rotated for the other directions
+    right = [(10, 40), (55, 40), (55, 18), (90, 50), (55, 82), (55, 60), (10, 60)]
+    turn = {
+        "RIGHT": lambda x, y: (x, y),
+        "LEFT": lambda x, y: (100 - x, y),
+        "UP": lambda x, y: (y, 100 - x),
+        "DOWN": lambda x, y: (100 - y, x),
+    }[direction]
+    draw.polygon([(px * s, py * s) for px, py in (turn(x, y) for x, y in right)], fill=ARROW_COLORS[direction])
+    return img
+
+# Focused data collection: each direction keeps only its own signals ("ignore others").
+# Signal quality and raw are always kept; IDLE keeps a small window of real noise.
+_KEEP = {
+    "UP": ("att",),
+    "DOWN": ("med",),
+    "LEFT": ("la", "ha"),
+    "RIGHT": ("lb", "hb"),
+    "IDLE": ("att", "med", "la", "ha", "lb", "hb"),
 }
+SAMPLE_MASKS = {d: np.array([k in ("sig", "raw") + keep for k in EEGSample._fields]) for d, keep in _KEEP.items()}
+
+# Which of norm_att, norm_med, norm_alpha, norm_beta each direction records
+NORM_MASKS = {
+    "UP": np.array([1, 0, 0, 0], bool),
+    "DOWN": np.array([0, 1, 0, 0], bool),
+    "LEFT": np.array([0, 0, 1, 0], bool),
+    "RIGHT": np.array([0, 0, 0, 1], bool),
+    "IDLE": np.array([1, 1, 1, 1], bool),
+}
+
 baseline_data = {
     "att": 50, "med": 50, "raw": 0,
     "delta": 0, "theta": 0, "la": 0, "ha": 0,
     "lb": 0, "hb": 0, "lg": 0, "mg": 0
 }
-data_lock = threading.Lock()
 ws_connected = False
+app = None  # TrainingApp, set once the window exists
 
 # Training session data
-training_data = []
 current_trial = 0
 total_trials = 100 * len(DIRECTIONS)
 is_training = False
 is_paused = False
 current_direction = None
+recording = False   # True while a trial's arrow is shown; on_message records samples then
+next_capture = 0.0  # time.monotonic() at which the next sample is due
 
 # CSV file
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -72,6 +194,9 @@ class TrainingApp:
         self.root.title("🧠 EEG Training Data Collector")
         self.root.geometry("900x920")
         self.current_filename = csv_filename
+        self._session = 0  # bumped per session so stale Tk timers from a stopped run do nothing
+        self._samples_lock = threading.Lock()  # WebSocket thread and manual captures both record
+        self.reset_samples()
         self.root.configure(bg="#f0f0f0")
         self.root.resizable(True, True)
         
@@ -143,6 +268,8 @@ class TrainingApp:
                                    font=("Arial", 50, "bold"), 
                                    bg="#2c3e50", fg="white")
         self.arrow_label.pack(expand=True)
+        # Arrows rendered once, so a trial only swaps the image instead of re-laying out a 50pt glyph
+        self._arrows = {d: ImageTk.PhotoImage(render_arrow(d)) for d in DIRECTIONS} if ImageTk else {}
         
         # Signal instruction label
         self.signal_instruction = tk.Label(main_frame, text="", 
@@ -252,51 +379,63 @@ class TrainingApp:
                                  bg="#9b59b6", fg="white", command=self.merge_data)
         self.merge_btn.pack(side="left", padx=5)
         
-        # Start WebSocket and update loop
+        # Redrawn only when the WebSocket thread reports new data
+        self._dirty = threading.Event()
+        self._last = {}  # widget -> (text, options) last sent to Tk
         self.update_ui()
         
+    def request_update(self):
+        """Schedule a UI refresh from any thread; bursts collapse into one redraw"""
+        if not self._dirty.is_set():
+            self._dirty.set()
+            self.root.after_idle(self.update_ui)
+    
+    def _set(self, widget, text, **kw):
+        """Configure a label only when its text or options actually change"""
+        if self._last.get(widget) != (text, kw):
+            widget.config(text=text, **kw)
+            self._last[widget] = (text, kw)
+    
     def update_ui(self):
         """Update UI with current data"""
-        global ws_connected, current_data
+        global ws_connected
         
-        with data_lock:
-            # Connection status
-            if ws_connected:
-                self.status_label.config(text="🟢 Connected", fg="#27ae60")
-            else:
-                self.status_label.config(text="🔴 Disconnected", fg="#e74c3c")
-            
-            # Signal quality (0=good, 200=bad, invert for display)
-            sig = current_data["sig"]
-            quality_percent = max(0, 100 - (sig / 2))
-            self.signal_bar['value'] = quality_percent
-            
-            if sig == 0:
-                self.signal_text.config(text="Excellent", fg="#27ae60")
-            elif sig < 50:
-                self.signal_text.config(text="Good", fg="#f39c12")
-            elif sig < 100:
-                self.signal_text.config(text="Fair", fg="#e67e22")
-            else:
-                self.signal_text.config(text="Poor", fg="#e74c3c")
-            
-            # Current values with color indicating strength
-            att = current_data['att']
-            med = current_data['med']
-            alpha_sum = current_data['la'] + current_data['ha']
-            beta_sum = current_data['lb'] + current_data['hb']
-            
-            self.att_label.config(text=f"↑ Attention: {att}")
-            self.med_label.config(text=f"↓ Meditation: {med}")
-            self.alpha_label.config(text=f"← Alpha: {alpha_sum}")
-            self.beta_label.config(text=f"→ Beta: {beta_sum}")
-        
-        # Schedule next update
-        self.root.after(100, self.update_ui)
+        self._dirty.clear()
+        snap = _snapshot[0]
+        # Connection status
+        if ws_connected:
+            self._set(self.status_label, "🟢 Connected", fg="#27ae60")
+        else:
+            self._set(self.status_label, "🔴 Disconnected", fg="#e74c3c")
+        
+        # Signal quality (0=good, 200=bad, invert for display)
+        sig = snap.sig
+        quality_percent = max(0, 100 - (sig / 2))
+        self.signal_bar['value'] = quality_percent
+        
+        if sig == 0:
+            self._set(self.signal_text, "Excellent", fg="#27ae60")
+        elif sig < 50:
+            self._set(self.signal_text, "Good", fg="#f39c12")
+        elif sig < 100:
+            self._set(self.signal_text, "Fair", fg="#e67e22")
+        else:
+            self._set(self.signal_text, "Poor", fg="#e74c3c")
+        
+        # Current values with color indicating strength
+        att = snap.att
+        med = snap.med
+        alpha_sum = snap.la + snap.ha
+        beta_sum = snap.lb + snap.hb
+        
+        self._set(self.att_label, f"↑ Attention: {att}")
+        self._set(self.med_label, f"↓ Meditation: {med}")
+        self._set(self.alpha_label, f"← Alpha: {alpha_sum}")
+        self._set(self.beta_label, f"→ Beta: {beta_sum}")
     
     def start_training(self):
         """Start full training session"""
-        global is_training, current_trial, training_data, total_trials, DISPLAY_TIME
+        global current_trial, total_trials, DISPLAY_TIME
         
         if not ws_connected:
             messagebox.showerror("Error", "Please wait for WebSocket connection!")
@@ -306,7 +445,7 @@ class TrainingApp:
         DISPLAY_TIME = self.time_var.get()
         samples_per_dir = self.samples_var.get()
         
-        if current_data["sig"] > 100:
+        if _snapshot[0].sig > 100:
             response = messagebox.askwarning("Warning", 
                 "Signal quality is poor. Continue anyway?")
             if not response:
@@ -320,9 +459,8 @@ class TrainingApp:
         total_trials = len(sequence)
         self.current_filename = csv_filename
         
-        is_training = True
         current_trial = 0
-        training_data = []
+        self.reset_samples()
         
         self.start_button.config(state="disabled")
         self.step_start_btn.config(state="disabled")
@@ -331,11 +469,11 @@ class TrainingApp:
         self.stop_button.config(state="normal")
         
         # Start training sequence
-        threading.Thread(target=self.training_loop, args=(sequence,), daemon=True).start()
+        self.start_sequence(sequence)
 
     def start_step_training(self):
         """Start single step training session for specific signal"""
-        global is_training, current_trial, training_data, total_trials, DISPLAY_TIME
+        global current_trial, total_trials, DISPLAY_TIME
         
         if not ws_connected:
             messagebox.showerror("Error", "Please wait for WebSocket connection!")
@@ -354,9 +492,8 @@ class TrainingApp:
         signal_name = SIGNAL_MAPPING.get(direction, direction)
         self.current_filename = f"step_data_{direction}_{signal_name}_{timestamp}.csv"
         
-        is_training = True
         current_trial = 0
-        training_data = []
+        self.reset_samples()
         
         self.start_button.config(state="disabled")
         self.step_start_btn.config(state="disabled")
@@ -365,23 +502,24 @@ class TrainingApp:
         self.stop_button.config(state="normal")
         
         # Start training sequence
-        threading.Thread(target=self.training_loop, args=(sequence,), daemon=True).start()
+        self.start_sequence(sequence)
     
     def stop_training(self):
         """Stop training session"""
-        global is_training, is_paused
+        global is_training, is_paused, recording
         is_training = False
         is_paused = False
+        recording = False
         
         self.start_button.config(state="normal")
         self.step_start_btn.config(state="normal")
         self.merge_btn.config(state="normal")
         self.pause_button.config(state="disabled", text="⏸ PAUSE", bg="#f39c12")
         self.stop_button.config(state="disabled")
-        self.arrow_label.config(text="Session Ended", fg="#95a5a6", font=("Segoe UI", 40, "bold"))
+        self.arrow_label.config(image="", text="Session Ended", fg="#95a5a6", font=("Segoe UI", 40, "bold"))
         self.signal_instruction.config(text="")
         
-        if len(training_data) > 0:
+        if self._n > 0:
             self.save_data()
 
     def toggle_pause(self):
@@ -391,7 +529,7 @@ class TrainingApp:
         
         if is_paused:
             self.pause_button.config(text="▶ RESUME", bg="#2980b9")
-            self.arrow_label.config(text="PAUSED", fg="#f1c40f")
+            self.arrow_label.config(image="", text="PAUSED", fg="#f1c40f")
         else:
             self.pause_button.config(text="⏸ PAUSE", bg="#f39c12")
     
@@ -407,21 +545,23 @@ class TrainingApp:
     def _run_calibration(self):
         """Background calibration loop"""
         global baseline_data
-        temp_data = []
+        keys = ["att", "med", "delta", "theta", "la", "ha", "lb", "hb", "lg", "mg"]
+        cols = [EEGSample._fields.index(k) for k in keys]
+        buf = np.empty((120, len(EEGSample._fields)), np.float32)  # 10 s at 100 ms, with headroom
+        n = 0
         start_time = time.time()
         
-        while time.time() - start_time < 10:
-            if current_data["sig"] < 50: # Only good data
-                with data_lock:
-                    temp_data.append(current_data.copy())
+        while time.time() - start_time < 10 and n < len(buf):
+            snap = _snapshot[0]
+            if snap.sig < 50: # Only good data
+                buf[n] = snap
+                n += 1
             time.sleep(0.1)
         
-        if len(temp_data) > 0:
-            # Calculate averages
-            keys = ["att", "med", "delta", "theta", "la", "ha", "lb", "hb", "lg", "mg"]
-            for k in keys:
-                values = [d[k] for d in temp_data]
-                baseline_data[k] = sum(values) / len(values)
+        if n > 0:
+            # Calculate averages (one reduction, accumulated in float64)
+            means = buf[:n, cols].mean(axis=0, dtype=np.float64)
+            baseline_data.update(zip(keys, means.tolist()))
             
             self.root.after(0, lambda: messagebox.showinfo("Calibration", 
                 f"Baseline set!\n\n"
@@ -434,65 +574,90 @@ class TrainingApp:
             
         self.root.after(0, lambda: self.calibrate_btn.config(text="⚖️ CALIBRATE", state="normal"))
     
-    def training_loop(self, sequence):
-        """Main training loop with auto-pause between blocks"""
-        global current_trial, current_direction, training_data, is_paused
-        
-        last_direction = None
+    def start_sequence(self, sequence):
+        """Run a training sequence on Tk timers, with auto-pause between blocks"""
+        global is_training, recording
+        
+        # Nothing records until _start_trial has set the first trial's direction
+        recording = False
+        self._session += 1
+        self._sequence = sequence
+        self._trial_index = 0
+        self._last_direction = None
+        is_training = True
+        self._next_trial(self._session)
+    
+    def _next_trial(self, session):
+        """Move to the next arrow, pausing first when the direction changes"""
+        global is_paused
         
-        for i, direction in enumerate(sequence):
-            # Check for stop
-            if not is_training:
-                break
-            
-            # Auto-pause on direction change
-            if last_direction is not None and direction != last_direction:
-                is_paused = True
-                self.root.after(0, lambda: self.pause_button.config(text="▶ RESUME", bg="#2980b9"))
-                signal_hint = SIGNAL_MAPPING.get(direction, "")
-                self.root.after(0, lambda d=direction, s=signal_hint: (
-                    self.arrow_label.config(text=f"Next: {d}", fg="#f39c12", font=("Arial", 40, "bold")),
-                    self.signal_instruction.config(text=f"Get ready to focus on: {s}")
-                ))
-                
-            last_direction = direction
-
-            # Check for pause
-            while is_paused and is_training:
-                time.sleep(0.5)
-            
-            if not is_training:
-                break
-
-            current_trial = i + 1
-            current_direction = direction
-
-            # Update UI for direction
-            self.root.after(0, self.update_training_ui, direction)
-
-            # Wait and collect multiple samples per direction
-            start_time = time.time()
-            collection_interval = 0.2  # 200ms
-            last_collection = 0
-            
-            while time.time() - start_time < DISPLAY_TIME:
-                if not is_training: break
-                
-                while is_paused and is_training:
-                    time.sleep(0.5)
-                    start_time += 0.5
-                
-                # Continuous collection logic
-                current_now = time.time()
-                if current_now - last_collection >= collection_interval:
-                    self.collect_sample(direction)
-                    last_collection = current_now
-                    
-                time.sleep(0.05)
+        # Check for stop
+        if not is_training or session != self._session:
+            return
         
         # Training complete
-        if is_training:
-            self.root.after(0, self.training_complete)
+        if self._trial_index >= len(self._sequence):
+            self.training_complete()
+            return
+        
+        direction = self._sequence[self._trial_index]
+        
+        # Auto-pause on direction change
+        if self._last_direction is not None and direction != self._last_direction:
+            is_paused = True
+            self.pause_button.config(text="▶ RESUME", bg="#2980b9")
+            self.arrow_label.config(image="", text=f"Next: {direction}", fg="#f39c12", font=("Arial", 40, "bold"))
+            self.signal_instruction.config(text=f"Get ready to focus on: {SIGNAL_MAPPING.get(direction, '')}")
+        
+        self._last_direction = direction
+        self._start_trial(session)
+    
+    def _start_trial(self, session):
+        """Show the current arrow once any pause has been lifted"""
+        global current_trial, current_direction, recording
+        
+        if not is_training or session != self._session:
+            return
+        
+        # Check for pause
+        if is_paused:
+            self.root.after(500, self._start_trial, session)
+            return
+        
+        direction = self._sequence[self._trial_index]
+        self._trial_index += 1
+        current_trial = self._trial_index
+        current_direction = direction
+        
+        # Update UI for direction; on_message records samples while it is shown
+        self.update_training_ui(direction)
+        self._ticks_left = max(1, DISPLAY_TIME * 1000 // COLLECTION_INTERVAL_MS)
+        recording = True
+        self._tick(session)
+    
+    def _tick(self, session):
+        """Count down the trial; time spent paused does not count towards it"""
+        if not is_training or session != self._session:
+            return
+        
+        if is_paused:
+            self.root.after(100, self._tick, session)
+            return
+        
+        self._ticks_left -= 1
+        
+        if self._ticks_left > 0:
+            self.root.after(COLLECTION_INTERVAL_MS, self._tick, session)
+        else:
+            self.root.after(COLLECTION_INTERVAL_MS, self._end_trial, session)
+    
+    def _end_trial(self, session):
+        """Stop recording for the finished arrow and move on"""
+        global recording
+        
+        if session == self._session:
+            recording = False
+        self._next_trial(session)
     
     def update_training_ui(self, direction):
         """Update UI for current training direction"""
@@ -504,14 +669,6 @@ class TrainingApp:
             "IDLE": "◯"
         }
         
-        colors = {
-            "LEFT": "#3498db",
-            "RIGHT": "#e74c3c",
-            "UP": "#2ecc71",
-            "DOWN": "#f39c12",
-            "IDLE": "#95a5a6"
-        }
-        
         signal_hints = {
             "LEFT": "Increase ALPHA: Close eyes, relax, think calm thoughts",
             "RIGHT": "Increase BETA: Stay alert, think actively, problem solve",
@@ -520,90 +677,55 @@ class TrainingApp:
             "IDLE": "Stay neutral, baseline state"
         }
         
-        self.arrow_label.config(text=arrow_symbols[direction], fg=colors[direction])
+        if direction in self._arrows:
+            self.arrow_label.config(image=self._arrows[direction])
+        else:
+            self.arrow_label.config(text=arrow_symbols[direction], fg=ARROW_COLORS[direction])
         self.signal_instruction.config(text=signal_hints.get(direction, ""))
-        self.progress_label.config(text=f"Progress: {current_trial}/{total_trials} - {direction} ({SIGNAL_MAPPING.get(direction, '')})")
+        self._set(self.progress_label, f"Progress: {current_trial}/{total_trials} - {direction} ({SIGNAL_MAPPING.get(direction, '')})")
         self.progress_bar['value'] = (current_trial / total_trials) * 100
     
-    def collect_sample(self, direction):
+    def reset_samples(self):
+        """Start an empty sample buffer sized for the session"""
+        with self._samples_lock:
+            self._samples = np.zeros(total_trials * 4, dtype=SAMPLE_DTYPE)
+            self._n = 0
+
+    def collect_sample(self, direction, snap=None):
         """Collect one training sample with signal-specific focus"""
-        global training_data
+        if snap is None:
+            snap = _snapshot[0]
         
         # Artifact Rejection
-        if current_data["sig"] > 50:
+        if snap.sig > 50:
             return
 
-        with data_lock:
-            # Calculate combined values
-            alpha = current_data["la"] + current_data["ha"]
-            beta = current_data["lb"] + current_data["hb"]
-            
-            # Focused data collection as per user instruction:
-            # "ignore others" when collecting for a specific direction
+        # Mask the frame down to this direction's signals without branching on it
+        values = np.where(SAMPLE_MASKS[direction], snap, 0.0)
+        _, att, med, _, _, _, la, ha, lb, hb, _, _ = values
+        
+        # Normalized values (against baseline)
+        norms = np.where(NORM_MASKS[direction], [
+            att - baseline_data["att"],
+            med - baseline_data["med"],
+            (la + ha) - (baseline_data["la"] + baseline_data["ha"]),
+            (lb + hb) - (baseline_data["lb"] + baseline_data["hb"]),
+        ], 0.0)
+        
+        with self._samples_lock:
+            # Grow the buffer when manual captures or long focus times overrun it
+            if self._n == len(self._samples):
+                self._samples = np.concatenate((self._samples, np.zeros_like(self._samples)))
             
-            # Default everything to 0
-            att = 0
-            med = 0
-            l_alpha = 0
-            h_alpha = 0
-            l_beta = 0
-            h_beta = 0
-            theta = 0
-            delta = 0
-            lg = 0
-            mg = 0
-            
-            if direction == "UP":
-                att = current_data["att"]
-            elif direction == "DOWN":
-                med = current_data["med"]
-            elif direction == "LEFT":
-                l_alpha = current_data["la"]
-                h_alpha = current_data["ha"]
-                alpha = l_alpha + h_alpha
-            elif direction == "RIGHT":
-                l_beta = current_data["lb"]
-                h_beta = current_data["hb"]
-                beta = l_beta + h_beta
-            elif direction == "IDLE":
-                # For idle, we might want to keep the true baseline or specific signals
-                # Let's keep a small window of real noise
-                att = current_data["att"]
-                med = current_data["med"]
-                l_alpha = current_data["la"]
-                h_alpha = current_data["ha"]
-                l_beta = current_data["lb"]
-                h_beta = current_data["hb"]
-            
-            sample = {
-                "timestamp": time.time(),
-                "direction": direction,
-                "signal_quality": current_data["sig"],
-                "attention": att,
-                "meditation": med,
-                "raw": current_data["raw"],
-                "delta": delta,
-                "theta": theta,
-                "low_alpha": l_alpha,
-                "high_alpha": h_alpha,
-                "low_beta": l_beta,
-                "high_beta": h_beta,
-                "low_gamma": lg,
-                "mid_gamma": mg,
-                # Normalized values (against baseline)
-                "norm_att": att - baseline_data["att"] if direction in ["UP", "IDLE"] else 0,
-                "norm_med": med - baseline_data["med"] if direction in ["DOWN", "IDLE"] else 0,
-                "norm_alpha": (l_alpha + h_alpha) - (baseline_data["la"] + baseline_data["ha"]) if direction in ["LEFT", "IDLE"] else 0,
-                "norm_beta": (l_beta + h_beta) - (baseline_data["lb"] + baseline_data["hb"]) if direction in ["RIGHT", "IDLE"] else 0
-            }
-            training_data.append(sample)
+            self._samples[self._n] = (time.time_ns(), DIRECTION_CODES[direction], *values.tolist(), *norms.tolist())
+            self._n += 1
     
     def training_complete(self):
         """Handle training completion"""
         global is_training
         
         is_training = False
-        self.arrow_label.config(text="✓ Complete", fg="#27ae60", font=("Segoe UI", 40, "bold"))
+        self.arrow_label.config(image="", text="✓ Complete", fg="#27ae60", font=("Segoe UI", 40, "bold"))
         self.signal_instruction.config(text="Training session finished!")
         self.start_button.config(state="normal")
         self.step_start_btn.config(state="normal")
@@ -613,25 +735,51 @@ class TrainingApp:
         
         self.save_data()
         messagebox.showinfo("Complete", 
-                          f"Training complete! {len(training_data)} samples collected.\n"
+                          f"Training complete! {self._n} samples collected.\n"
                           f"Data saved to: {self.current_filename}")
     
     def save_data(self):
         """Save training data to CSV"""
-        if len(training_data) == 0:
+        if self._n == 0:
             return
         
-        with open(self.current_filename, 'w', newline='') as f:
-            fieldnames = training_data[0].keys()
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(training_data)
-        
-        print(f"✅ Saved {len(training_data)} samples to {self.current_filename}")
-
+        with self._samples_lock:
+            samples = self._samples[:self._n].tolist()
+        
+        # Format every row up front and hand them to one large buffered binary write
+        rows = [CSV_HEADER]
+        for ts, code, *values in samples:
+            secs, us = divmod(ts // 1000, 1_000_000)
+            rows.append(CSV_ROW_FORMAT % (secs, us, DIRECTION_BYTES[code], *values))
+        
+        with open(self.current_filename, 'wb', buffering=1 << 20) as f:
+            f.writelines(rows)
+        
+        print(f"✅ Saved {len(samples)} samples to {self.current_filename}")
+
+    def concat_csv_files(self, files, out_path):
+        """Append CSVs that share a header into out_path; returns the data row count"""
+        rows = 0
+        with open(out_path, 'wb') as out:
+            for i, file in enumerate(files):
+                with open(file, 'rb') as src:
+                    header = src.readline()
+                    if i == 0:
+                        out.write(header)
+                    last = b"\n"
+                    while chunk := src.read(1 << 20):
+                        out.write(chunk)
+                        rows += chunk.count(b"\n")
+                        last = chunk[-1:]
+                    if last != b"\n":
+                        # Keep the next file's first row off this file's last line
+                        out.write(b"\n")
+                        rows += 1
+        return rows
+    
     def merge_data(self):
         """Merge all step data files into one"""
-        step_files = glob.glob("step_data_*.csv")
+        step_files = sorted(glob.glob("step_data_*.csv"))
         if not step_files:
             messagebox.showinfo("Merge", "No step data files found to merge.")
             return
@@ -640,30 +788,35 @@ class TrainingApp:
         if not response:
             return
             
-        merged_data = []
         try:
-            for file in step_files:
-                with open(file, 'r') as f:
-                    reader = csv.DictReader(f)
-                    merged_data.extend(list(reader))
-            
             # Save to main file
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             merged_filename = f"merged_training_{timestamp}.csv"
             
-            if merged_data:
-                with open(merged_filename, 'w', newline='') as f:
-                    fieldnames = merged_data[0].keys()
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(merged_data)
-                
-                messagebox.showinfo("Success", f"Merged {len(merged_data)} samples into {merged_filename}")
+            headers = set()
+            for file in step_files:
+                with open(file, 'rb') as f:
+                    headers.add(f.readline().rstrip(b"\r\n"))
+            
+            if len(headers) == 1:
+                # Same columns everywhere: copy the bytes through without parsing
+                merged_rows = self.concat_csv_files(step_files, merged_filename)
+            else:
+                # Files from older versions of the collector may differ in columns
+                merged_df = pd.concat([pd.read_csv(file) for file in step_files], ignore_index=True)
+                merged_rows = len(merged_df)
+                if merged_rows > 0:
+                    merged_df.to_csv(merged_filename, index=False)
+            
+            if merged_rows > 0:
+                messagebox.showinfo("Success", f"Merged {merged_rows} samples into {merged_filename}")
                 
                 if messagebox.askyesno("Cleanup", "Delete individual step files?"):
                     for file in step_files:
                         os.remove(file)
             else:
+                if os.path.exists(merged_filename):
+                    os.remove(merged_filename)
                 messagebox.showwarning("Error", "No data found in files.")
                 
         except Exception as e:
@@ -674,40 +827,90 @@ def on_open(ws):
     global ws_connected
     ws_connected = True
     print("✅ Connected to ESP32")
+    if app is not None:
+        app.request_update()
 
 def on_close(ws, close_status_code, close_msg):
     global ws_connected
     ws_connected = False
     print("❌ Disconnected from ESP32")
+    if app is not None:
+        app.request_update()
 
 def on_error(ws, error):
     print(f"⚠️ WebSocket error: {error}")
 
 def on_message(ws, message):
-    global current_data
+    global next_capture
     
     try:
-        data = json.loads(message)
-        with data_lock:
-            current_data.update(data)
-    except:
+        if isinstance(message, bytes):
+            # Binary frame: every field, no text parsing
+            snap = _snapshot[0] = EEGSample._make(BINARY_FRAME.unpack(message))
+        else:
+            snap = _snapshot[0] = decode_frame(message, _snapshot[0])
+        if app is None:
+            return
+        
+        # While an arrow is shown, record straight from the frame that just arrived
+        if recording and is_training and not is_paused:
+            now = time.monotonic()
+            if now >= next_capture:
+                # Stay on a fixed grid so frame jitter does not stretch the interval
+                interval = COLLECTION_INTERVAL_MS / 1000
+                next_capture = now - (now - next_capture) % interval + interval
+                app.collect_sample(current_direction, snap)
+        app.request_update()
+    except (ValueError, TypeError, AttributeError, struct.error):
+        # Malformed frame; drop it
         pass
 
+async def ws_task():
+    """Receive frames with the asyncio client, which reconnects with backoff by itself"""
+    async for ws in websockets.connect(WS_URL, compression=None,
+                                       ping_interval=PING_INTERVAL_S, ping_timeout=PING_TIMEOUT_S):
+        # connect() takes no socket options; asyncio already sets TCP_NODELAY,
+        # so apply WS_SOCKOPT (the larger SO_RCVBUF) to the connected socket
+        sock = ws.transport.get_extra_info("socket")
+        if sock is not None:
+            for opt in WS_SOCKOPT:
+                sock.setsockopt(*opt)
+        on_open(ws)
+        try:
+            async for message in ws:
+                on_message(ws, message)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            on_close(ws, None, None)
+
 def run_websocket():
     """Run WebSocket in background"""
+    if websockets is not None:
+        # connect() retries refused connections itself; anything else ends the
+        # loop, so restart it here the same way as the websocket-client path
+        while True:
+            try:
+                asyncio.run(ws_task())
+            except Exception as e:
+                print(f"⚠️ WebSocket error: {e}")
+            time.sleep(RECONNECT_S)
+    
+    # One app for the whole session; each run_forever() opens a fresh socket on it
+    ws = websocket.WebSocketApp(
+        WS_URL,
+        on_open=on_open,
+        on_message=on_message,
+        on_error=on_error,
+        on_close=on_close
+    )
     while True:
         try:
-            ws = websocket.WebSocketApp(
-                WS_URL,
-                on_open=on_open,
-                on_message=on_message,
-                on_error=on_error,
-                on_close=on_close
-            )
-            ws.run_forever()
-        except:
-            pass
-        time.sleep(3)
+            ws.run_forever(ping_interval=PING_INTERVAL_S, ping_timeout=PING_TIMEOUT_S,
+                           sockopt=WS_SOCKOPT)
+        except (websocket.WebSocketException, OSError) as e:
+            print(f"⚠️ WebSocket error: {e}")
+        time.sleep(RECONNECT_S)
 
 # Start WebSocket thread
 ws_thread = threading.Thread(target=run_websocket, daemon=True)